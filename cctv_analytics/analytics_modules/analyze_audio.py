@@ -4,66 +4,48 @@ from datetime import datetime
 import pytz
 import logging
 
-from pymilvus import MilvusClient
-from ollama import Client as OllamaClient
-
-from apis.whispar_setup import WhisparAPI
-from apis.minio_setup import setup_minio, save_image_to_minio
-from apis.slack_setup import SlackAPI
-
-from apis.minio_setup import save_voice_to_minio
-from apis.xtts_setup import XttsAPI
+from apis.clients import (
+    embedding_service,
+    milvus_writer,
+    minio_uploader,
+    whispar_client,
+    xtts_client,
+)
 from analytics_modules.audio.audio_milvus_setup import (
-    create_schema_cctv_transcription,
-    create_schema_voice_embeddings,
+    cctv_transcription_spec,
+    voice_embeddings_spec,
 )
 
 
 from utils.config import genconf
+from utils.camera_routing import message_timestamp
 
 config = genconf()
 
-
-# Minio Client
+# Clients are created on first use by the shared registry
 minio_bucket = config.minio.bucket_name
-minio_client = setup_minio(
-    config.minio.host,
-    config.minio.access_key,
-    config.minio.secret_key,
-    config.minio.location,
-    minio_bucket,
-)
-
-
-# Milvus configuration
-milvus_client = MilvusClient(uri=config.milvus.uri, token=config.milvus.token)
-
-# Whispar configuration
-whispar_client = WhisparAPI(config.whispar.api_url, config.whispar.api_key)
-
-# XTTS configuration
-xtts_client = XttsAPI(config.xtts.api_url)
 xtts_voice_embedding_dimmension = 512
 
-# Slack notifications
-slack_client = SlackAPI(config.slack)
-
 # OLLAMA - Person caption embedding model
 ollama_embedding_model = config.ollama.embedding_model
 ollama_model_embeddings_dimmension = config.ollama.embedding_dim
-ollama_client = OllamaClient(host=config.ollama.host)
 
-create_schema_cctv_transcription(milvus_client, ollama_model_embeddings_dimmension)
-create_schema_voice_embeddings(milvus_client, xtts_voice_embedding_dimmension)
+# Collections of audio analytics, created by the startup bootstrap
+milvus_collections = [
+    cctv_transcription_spec(ollama_model_embeddings_dimmension),
+    voice_embeddings_spec(xtts_voice_embedding_dimmension),
+]
 
 
 def save_voice_chunks_to_minio(res_transcriptions_list, timestamp, camera_name):
     for chunk_info in res_transcriptions_list:
-        save_voice_to_minio(
-            minio_client,
-            chunk_info["chunk"],
+        chunk = chunk_info["chunk"]
+        # Chunks of a segment share its timestamp, keyed by their offset in ms
+        minio_uploader().upload(
             minio_bucket,
-            f"{camera_name}.{timestamp}.wav",
+            f"{camera_name}.{timestamp}.{chunk_info['delta']}.{chunk.extension}",
+            chunk,
+            content_type=chunk.content_type,
         )
 
 
@@ -74,10 +56,7 @@ def save_audio_transcription(res_transcriptions_list, timestamp, camera_name):
 
     if len(res_transcriptions_list) > 0:
         # Generate embeddings for text
-        ollama_embedding_response = ollama_client.embeddings(
-            model=ollama_embedding_model, prompt=transcription_text
-        )
-        text_embedding = ollama_embedding_response["embedding"]
+        text_embedding = embedding_service().embed(transcription_text)
 
         # Save to Milvus
         data = {
@@ -89,12 +68,12 @@ def save_audio_transcription(res_transcriptions_list, timestamp, camera_name):
             "processing_timestamp": timestamp,
         }
 
-        milvus_res = milvus_client.insert(
+        milvus_writer().insert(
             collection_name="cctv_transcription",
             data=[data],
         )
         logging.debug(
-            "Successfully inserted caption from audio to milvus 'cctv_transcription'"
+            "Successfully queued caption from audio for milvus 'cctv_transcription'"
         )
 
 
@@ -103,7 +82,7 @@ def save_multiple_voice_embeddings_to_milvus(
 ):
     # Split audio by delta - list might be empty!
     for chunk_info in res_transcriptions_list:
-        res = xtts_client.generate_speaker_embeddings(chunk_info["chunk"])
+        res = xtts_client().generate_speaker_embeddings(chunk_info["chunk"])
         # Save to Milvus
         data = {
             "speaker_embedding": res["speaker_embedding"],
@@ -113,27 +92,28 @@ def save_multiple_voice_embeddings_to_milvus(
             "camera_location": config.location,
             "processing_timestamp": timestamp,
         }
-        milvus_res = milvus_client.insert(
+        milvus_writer().insert(
             collection_name="master_voices",
             data=[data],
         )
         logging.debug(
-            "Successfully saved voice embeddings from audio to milvus 'master-voices'"
+            "Successfully queued voice embeddings from audio for milvus 'master-voices'"
         )
 
 
 def analyze_audio(message, camera):
     try:
         camera_name = camera.name
-        ts_parsed = str(message.headers[1][1].decode()).split(".")[0]
-        timestamp = int(ts_parsed)
+        timestamp = message_timestamp(message, config.kafka.headers)
 
         # Capture data from CCTV
         audio = message.value
 
         audio_buffer = BytesIO(audio)
 
-        res_transcriptions_list = whispar_client.transcribe_whole_segment(audio_buffer)
+        res_transcriptions_list = whispar_client().transcribe_whole_segment(
+            audio_buffer
+        )
 
         save_audio_transcription(res_transcriptions_list, timestamp, camera_name)
 
@@ -6,47 +6,40 @@ import base64
 import json
 from datetime import datetime
 import pytz
-from ollama import Client as OllamaClient
-from pymilvus import MilvusClient
+import threading
+from typing import Dict
 
 
-from apis.deepface_setup import DeepfaceAPI, encode_image
-from apis.florence_setup import FlorenceAPI
-from apis.minio_setup import setup_minio, save_image_to_minio
-from apis.slack_setup import SlackAPI
-from apis.influxdb_setup import InfluxAPI
+from apis.clients import (
+    deepface_client,
+    embedding_service,
+    florence_batcher,
+    florence_client,
+    influx_client,
+    milvus_client,
+    milvus_writer,
+    minio_client,
+    minio_uploader,
+    ollama_client,
+    slack_client,
+)
 
 from analytics_modules.car_plates.car_plates_analytics import CarPlatesAnalytic
+from analytics_modules.motion.change_detector import ChangeDetector
 from analytics_modules.persons.persons_analytics import (
     PersonsAnalytic,
-    PersonsAnalyticSetup,
+    persons_milvus_collections,
 )
 
 from utils.config import genconf
+from utils.camera_routing import message_timestamp
 
 config = genconf()
 
-
-# InfluxDB
-influx_client = InfluxAPI(
-    url=config.influxdb.api_url,
-    token=config.influxdb.token,
-    org=config.influxdb.org,
-    bucket=config.influxdb.bucket,
-)
-
-# Minio Client
+# Clients are created on first use by the shared registry
 minio_bucket = config.minio.bucket_name
-minio_client = setup_minio(
-    config.minio.host,
-    config.minio.access_key,
-    config.minio.secret_key,
-    config.minio.location,
-    minio_bucket,
-)
 
 # Deepface configuration
-deepface_client = DeepfaceAPI(config.deepface.url)
 deepface_model_name = config.deepface.deepface_model_name
 deepface_detector_name = config.deepface.deepface_model_name
 deepface_model_embeddings_dimmension = config.deepface.embedding_dim
@@ -54,47 +47,53 @@ deepface_model_embeddings_dimmension = config.deepface.embedding_dim
 # OLLAMA - Person caption embedding model
 ollama_embedding_model = config.ollama.embedding_model
 ollama_model_embeddings_dimmension = config.ollama.embedding_dim
-ollama_url = config.ollama.host
-ollama_client = OllamaClient(host=ollama_url)
 
-# Milvus configuration
-milvus_client = MilvusClient(uri=config.milvus.uri, token=config.milvus.token)
-
-# Florence configuration
-florence_client = FlorenceAPI(config.florence.url)
-
-# Slack notifications
-slack_client = SlackAPI(config.slack)
-
-# Setup Persons Analytics
-PersonsAnalyticSetup(
-    milvus_client,
+# Collections of Persons Analytics, created by the startup bootstrap
+milvus_collections = persons_milvus_collections(
     deepface_model_embeddings_dimmension,
     ollama_model_embeddings_dimmension,
 )
 
-persons_analytics_instances = [
-    PersonsAnalytic(
-        camera,
-        slack_client,
-        florence_client,
-        deepface_client,
-        deepface_model_name,
-        deepface_detector_name,
-        milvus_client,
-        ollama_client,
-        ollama_embedding_model,
-        minio_client,
-        minio_bucket,
-    )
+persons_analytics_instances: Dict[str, PersonsAnalytic] = {}
+persons_analytics_lock = threading.Lock()
+
+
+def persons_analytic_for(camera) -> PersonsAnalytic:
+    """Persons Analytics of the camera, set up on its first frame."""
+    with persons_analytics_lock:
+        if camera.name not in persons_analytics_instances:
+            persons_analytics_instances[camera.name] = PersonsAnalytic(
+                camera,
+                slack_client(),
+                florence_client(),
+                deepface_client(),
+                deepface_model_name,
+                deepface_detector_name,
+                milvus_client(),
+                ollama_client(),
+                ollama_embedding_model,
+                minio_client(),
+                minio_bucket,
+                florence_batcher=florence_batcher(),
+                deepface_scan_mode=config.deepface.scan_mode,
+                deepface_actions=config.deepface.actions,
+                milvus_writer=milvus_writer(),
+                embedding_service=embedding_service(),
+                minio_uploader=minio_uploader(),
+            )
+        return persons_analytics_instances[camera.name]
+
+
+change_detectors = {
+    camera.name: ChangeDetector(camera)
     for camera in config.cameras
-]
+    if camera.motion.enabled
+}
 
 
 def analyze_image(message, camera):
     try:
-        ts_parsed = str(message.headers[1][1].decode()).split(".")[0]
-        timestamp = int(ts_parsed)
+        timestamp = message_timestamp(message, config.kafka.headers)
 
         # Convert the timestamp to a datetime object
         dt = datetime.fromtimestamp(timestamp, pytz.timezone("Europe/Warsaw"))
@@ -103,6 +102,11 @@ def analyze_image(message, camera):
         # Capture data from CCTV
         image_bytes = message.value
 
+        # Skip frames without scene changes
+        change_detector = change_detectors.get(camera.name)
+        if change_detector and not change_detector.has_changed(image_bytes, timestamp):
+            return
+
         # Open the image using PIL
         image_buffer = BytesIO(image_bytes)
         image = Image.open(image_buffer)
@@ -112,7 +116,7 @@ def analyze_image(message, camera):
         img_base64 = base64.b64encode(image_buffer.getvalue()).decode("utf-8")
 
         # Detect objects
-        od_rest_dict_list = florence_client.image_ocr_od_caption(
+        od_rest_dict_list = florence_client().image_ocr_od_caption(
             base64_image=img_base64, prompts=["<OD>"]
         )
 
@@ -126,16 +130,7 @@ def analyze_image(message, camera):
                 )
                 # Person Analytics
                 try:
-                    found_inst_p_a: Optional[PersonsAnalytic] = None  # Type annotation
-                    found_inst_p_a = next(
-                        (
-                            inst
-                            for inst in persons_analytics_instances
-                            if inst.camera_name == camera.name
-                        ),
-                        None,
-                    )
-                    found_inst_p_a.process_persons(
+                    persons_analytic_for(camera).process_persons(
                         image, od_res_dict, formatted_ts, timestamp
                     )
                 except Exception as e:
@@ -147,7 +142,10 @@ def analyze_image(message, camera):
                 try:
                     if "car_plates" in camera:
                         CarPlatesAnalytic(
-                            camera, florence_client, influx_client
+                            camera,
+                            florence_client(),
+                            influx_client(),
+                            florence_batcher(),
                         ).process_cars(image, od_res_dict, timestamp)
                 except Exception as e:
                     logging.error("Could not process car analytics")
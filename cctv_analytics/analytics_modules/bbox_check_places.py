@@ -1,7 +1,186 @@
+import os
 import json
+import hashlib
+import logging
+import numpy as np
+import shapely
+from PIL import Image, ImageDraw
 from shapely.geometry import Polygon, box
 from typing import Optional, List
-from utils.config import Place
+from utils.config import Camera, Place
+
+
+class PlaceIndex:
+    """
+    Place polygons of a camera compiled once into an STRtree.
+
+    Queries take a single bbox or an (N,4) array of x1, y1, x2, y2 bboxes and
+    return the names of intersecting places in the order they are configured.
+    """
+
+    def __init__(self, places: List[Place]):
+        self.names = [place.name for place in places]
+        self.polygons = [Polygon(place.polygon) for place in places]
+        self.tree = shapely.STRtree(self.polygons)
+
+    def overlapping_many(self, bboxes) -> List[List[str]]:
+        """Check which polygons each of the bounding boxes overlaps with."""
+        bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+        results = [[] for _ in range(len(bboxes))]
+        if not self.names or not len(bboxes):
+            return results
+
+        bbox_polys = shapely.box(bboxes[:, 0], bboxes[:, 1], bboxes[:, 2], bboxes[:, 3])
+        bbox_indexes, place_indexes = self.tree.query(
+            bbox_polys, predicate="intersects"
+        )
+        # Keep configured order of places for every bbox
+        order = np.lexsort((place_indexes, bbox_indexes))
+        for bbox_index, place_index in zip(bbox_indexes[order], place_indexes[order]):
+            results[bbox_index].append(self.names[place_index])
+        return results
+
+    def overlapping(self, bbox) -> List[str]:
+        return self.overlapping_many([bbox])[0]
+
+
+class PlaceRaster:
+    """
+    Place polygons of a camera rasterized into a label bitmap.
+
+    Every cell of the bitmap covers `downscale` x `downscale` frame pixels and
+    holds a bitmask of the places covering it (64 places per uint64 word).
+    A summed-area table per place is derived from it, so the covered cells of
+    all bboxes of a frame are counted for all places with four lookups each,
+    without a Python loop over bboxes, at 4 bytes per cell and place of
+    memory. Places match the polygon intersection
+    up to `downscale` pixels at their edges. Bitmaps are cached in `cache_dir`
+    keyed by the places and the downscale.
+    """
+
+    def __init__(
+        self, places: List[Place], downscale: int = 4, cache_dir: Optional[str] = None
+    ):
+        self.names = [place.name for place in places]
+        self.downscale = downscale
+        self.words = max(1, -(-len(places) // 64))
+        self.labels = self._load_or_rasterize(places, cache_dir)
+        self.summed_areas = self._summed_areas(self.labels, len(places))
+
+    def _cache_path(self, places: List[Place], cache_dir: str) -> str:
+        key = json.dumps(
+            [[place.name, place.polygon] for place in places] + [self.downscale]
+        )
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(cache_dir, f"places_{digest}.npy")
+
+    def _load_or_rasterize(
+        self, places: List[Place], cache_dir: Optional[str]
+    ) -> np.ndarray:
+        if cache_dir is None:
+            return self._rasterize(places)
+
+        cache_path = self._cache_path(places, cache_dir)
+        if os.path.exists(cache_path):
+            try:
+                return np.load(cache_path)
+            except Exception as e:
+                logging.warning(f"[Places] Could not load {cache_path}: {e}")
+
+        labels = self._rasterize(places)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, labels)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logging.warning(f"[Places] Could not cache {cache_path}: {e}")
+        return labels
+
+    def _rasterize(self, places: List[Place]) -> np.ndarray:
+        points = [point for place in places if place.polygon for point in place.polygon]
+        if not points:
+            return np.zeros((0, 0, self.words), dtype=np.uint64)
+
+        max_x, max_y = np.max(np.asarray(points, dtype=np.float64), axis=0)
+        width = int(max_x // self.downscale) + 1
+        height = int(max_y // self.downscale) + 1
+        labels = np.zeros((height, width, self.words), dtype=np.uint64)
+        for index, place in enumerate(places):
+            if not place.polygon:
+                continue
+            mask_image = Image.new("1", (width, height), 0)
+            ImageDraw.Draw(mask_image).polygon(
+                [(x / self.downscale, y / self.downscale) for x, y in place.polygon],
+                fill=1,
+                outline=1,
+            )
+            mask = np.asarray(mask_image, dtype=bool)
+            labels[mask, index // 64] |= np.uint64(1 << (index % 64))
+        return labels
+
+    @staticmethod
+    def _summed_areas(labels: np.ndarray, places_count: int) -> np.ndarray:
+        """
+        Summed-area tables of the place masks, shape (places, height + 1,
+        width + 1) with a zero first row and column.
+        """
+        height, width = labels.shape[:2]
+        masks = np.unpackbits(
+            labels.view(np.uint8).reshape(height, width, -1),
+            axis=2,
+            bitorder="little",
+        )[:, :, :places_count]
+        summed_areas = np.zeros((places_count, height + 1, width + 1), dtype=np.int32)
+        np.cumsum(
+            np.cumsum(masks.transpose(2, 0, 1), axis=1, dtype=np.int32),
+            axis=2,
+            out=summed_areas[:, 1:, 1:],
+        )
+        return summed_areas
+
+    def overlapping_many(self, bboxes) -> List[List[str]]:
+        """Check which polygons each of the bounding boxes overlaps with."""
+        bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+        results = [[] for _ in range(len(bboxes))]
+        places_count, height, width = self.summed_areas.shape
+        height, width = height - 1, width - 1
+        if not len(bboxes) or not places_count or not height or not width:
+            return results
+
+        x1, y1, x2, y2 = (bboxes // self.downscale).astype(np.int64).T
+        inside = (x2 >= 0) & (y2 >= 0) & (x1 < width) & (y1 < height)
+        inside &= (x2 >= x1) & (y2 >= y1)
+        x1, x2 = np.clip(x1, 0, width - 1), np.clip(x2, 0, width - 1) + 1
+        y1, y2 = np.clip(y1, 0, height - 1), np.clip(y2, 0, height - 1) + 1
+
+        # Covered cells of every (place, bbox)
+        covered = (
+            self.summed_areas[:, y2, x2]
+            - self.summed_areas[:, y1, x2]
+            - self.summed_areas[:, y2, x1]
+            + self.summed_areas[:, y1, x1]
+        )
+        for bbox_index, place_index in zip(
+            *np.nonzero((covered > 0).T & inside[:, None])
+        ):
+            results[bbox_index].append(self.names[place_index])
+        return results
+
+    def overlapping(self, bbox) -> List[str]:
+        return self.overlapping_many([bbox])[0]
+
+
+def place_index_for(camera: Camera):
+    """Place lookup of the camera, rasterized when `places_raster` is enabled."""
+    if camera.places_raster.enabled:
+        return PlaceRaster(
+            camera.places,
+            camera.places_raster.downscale,
+            camera.places_raster.cache_dir,
+        )
+    return PlaceIndex(camera.places)
 
 
 def check_bbox_overlap(bbox, places: List[Place]):
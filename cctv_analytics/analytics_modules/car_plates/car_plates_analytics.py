@@ -7,22 +7,29 @@ import logging
 from influxdb_client import InfluxDBClient
 
 from apis.florence_setup import FlorenceAPI
+from apis.florence_batcher import FlorenceBatcher
 from apis.influxdb_setup import InfluxAPI
 
 
 class CarPlatesAnalytic:
-    def __init__(self, camera, florence_client, influx_client):
+    def __init__(self, camera, florence_client, influx_client, florence_batcher=None):
         self.camera = camera
         self.florence_client: Optional[FlorenceAPI] = florence_client
+        self.florence_batcher: Optional[FlorenceBatcher] = florence_batcher
         self.influx_client: Optional[InfluxAPI] = influx_client
         self.camera_name = self.camera["name"]
 
     def _run_ocr_over_car(self, image, dt_time):
-        res = self.florence_client.image_ocr_od_caption(
-            base64_image=pillow_image_to_base64(image), prompts=["<OCR>"]
-        )
-        if len(res) > 0:
-            plate_text = res[0]["res"]
+        if self.florence_batcher is not None:
+            plate_text = self.florence_batcher.run_prompt(
+                pillow_image_to_base64(image), "<OCR>"
+            )
+        else:
+            res = self.florence_client.image_ocr_od_caption(
+                base64_image=pillow_image_to_base64(image), prompts=["<OCR>"]
+            )
+            plate_text = res[0]["res"] if len(res) > 0 else None
+        if plate_text is not None:
             p = (
                 self.influx_client.client.Point("plates_detected")
                 .tag("camera", self.camera_name)
@@ -0,0 +1,94 @@
+import logging
+from io import BytesIO
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from utils.config import Camera
+from utils.metrics import metrics
+
+
+class ChangeDetector:
+    """
+    Detects whether the scene of a camera changed since previous frames.
+
+    Frames are compared as downscaled grayscale images against a rolling
+    background (exponential moving average). A frame passes when the fraction
+    of pixels differing from the background by more than `pixel_threshold`
+    reaches `threshold`. When `mask_places` is set only pixels inside the
+    camera `places` polygons are compared. A frame is passed at least every
+    `max_skip_s` seconds, so detections of people standing still are refreshed.
+    """
+
+    def __init__(self, camera: Camera):
+        self.camera = camera
+        self.camera_name = camera.name
+        self.config = camera.motion
+        self._background: Optional[np.ndarray] = None
+        self._mask: Optional[np.ndarray] = None
+        self._last_passed_ts: Optional[float] = None
+
+    def _downscaled_frame(self, image_bytes: bytes) -> Tuple[np.ndarray, tuple]:
+        """
+        Decode frame as grayscale of `width` pixels, JPEG frames are decoded
+        directly at reduced scale.
+
+        :return: Frame as float32 array and size of the original frame.
+        """
+        image = Image.open(BytesIO(image_bytes))
+        full_size = image.size
+        width = self.config.width
+        height = max(1, round(full_size[1] * width / full_size[0]))
+        image.draft("L", (width, height))
+        small = image.convert("L").resize((width, height), Image.BILINEAR)
+        return np.asarray(small, dtype=np.float32), full_size
+
+    def _places_mask(self, full_size: tuple, shape: tuple) -> Optional[np.ndarray]:
+        places = [place for place in self.camera.places if place.polygon]
+        if not self.config.mask_places or not places:
+            return None
+
+        scale_x = shape[1] / full_size[0]
+        scale_y = shape[0] / full_size[1]
+        mask_image = Image.new("1", (shape[1], shape[0]), 0)
+        draw = ImageDraw.Draw(mask_image)
+        for place in places:
+            draw.polygon([(x * scale_x, y * scale_y) for x, y in place.polygon], fill=1)
+        mask = np.asarray(mask_image, dtype=bool)
+        return mask if mask.any() else None
+
+    def has_changed(self, image_bytes: bytes, timestamp: float) -> bool:
+        frame, full_size = self._downscaled_frame(image_bytes)
+
+        if self._background is None or self._background.shape != frame.shape:
+            self._background = frame.copy()
+            self._mask = self._places_mask(full_size, frame.shape)
+            score = 1.0
+        else:
+            changed_pixels = (
+                np.abs(frame - self._background) > self.config.pixel_threshold
+            )
+            if self._mask is not None:
+                changed_pixels = changed_pixels[self._mask]
+            score = float(changed_pixels.mean())
+
+            # Update rolling background in place
+            self._background *= 1.0 - self.config.background_alpha
+            self._background += self.config.background_alpha * frame
+
+        passed = (
+            score >= self.config.threshold
+            or self._last_passed_ts is None
+            or timestamp - self._last_passed_ts >= self.config.max_skip_s
+        )
+        metrics.set("motion_score", self.camera_name, score)
+        if passed:
+            self._last_passed_ts = timestamp
+            metrics.inc("motion_frames_passed", self.camera_name)
+        else:
+            metrics.inc("motion_frames_skipped", self.camera_name)
+            logging.debug(
+                f"[{self.camera_name}][Motion] Skipping frame, change score {score:.4f}"
+            )
+        return passed
@@ -6,23 +6,29 @@ import json
 import base64
 import hashlib
 import locale
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from io import BytesIO
 from typing import Optional
 from datetime import datetime
 
 
+import numpy as np
 from PIL import Image
-from common import pillow_image_to_base64, expand_pillow_cropped_image
+from common import CropArtifact, crop_facial_area, expand_pillow_cropped_image
 
 from apis.minio_setup import save_image_to_minio
+from apis.deepface_setup import DEFAULT_ACTIONS
 
-from analytics_modules.bbox_check_places import check_place
+from analytics_modules.bbox_check_places import place_index_for
 from analytics_modules.persons.persons_milvus_setup import (
-    create_schema_master_faces,
-    create_schema_cctv_persons_actions,
+    master_faces_spec,
+    cctv_persons_actions_spec,
 )
 from analytics_modules.persons.persons_roi import ROITimeoutScheduler
+from analytics_modules.persons.persons_tracker import PersonsTracker
 from utils.config import genconf, Camera
+from utils.metrics import metrics
 
 config = genconf()
 import gettext
@@ -40,15 +46,21 @@ lang_to_install = gettext.translation(
 lang_to_install.install()
 
 
-def PersonsAnalyticSetup(
-    client_milvus,
+# Shared by all cameras, per frame concurrency is limited in process_persons
+persons_executor = ThreadPoolExecutor(
+    max_workers=config.persons.workers, thread_name_prefix="persons"
+)
+
+
+def persons_milvus_collections(
     deepface_model_embeddings_dimmension,
     ollama_model_embeddings_dimmension,
 ):
-    create_schema_master_faces(client_milvus, deepface_model_embeddings_dimmension)
-    create_schema_cctv_persons_actions(
-        client_milvus, ollama_model_embeddings_dimmension
-    )
+    """Milvus collections of persons analytics, created by the startup bootstrap."""
+    return [
+        master_faces_spec(deepface_model_embeddings_dimmension),
+        cctv_persons_actions_spec(ollama_model_embeddings_dimmension),
+    ]
 
 
 class PersonsAnalytic:
@@ -66,41 +78,64 @@ class PersonsAnalytic:
         minio_client=None,
         minio_bucket=None,
         setup_roi_schedulers=True,
+        florence_batcher=None,
+        deepface_scan_mode="separate",
+        deepface_actions=None,
+        milvus_writer=None,
+        embedding_service=None,
+        minio_uploader=None,
     ):
         self.camera = camera
         self.slack_client = slack_client
         self.florence_client = florence_client
+        self.florence_batcher = florence_batcher
         self.deepface_client = deepface_client
         self.deepface_model_name = deepface_model_name
         self.deepface_detector_name = deepface_detector_name
+        self.deepface_scan_mode = deepface_scan_mode
+        self.deepface_actions = deepface_actions or DEFAULT_ACTIONS
         self.milvus_client = milvus_client
+        # Rows are inserted in bulk through the buffered writer when given
+        self.milvus_writer = milvus_writer if milvus_writer else milvus_client
         self.camera_name = self.camera.name
         self.ollama_client = ollama_client
         self.ollama_embedding_model = ollama_embedding_model
+        self.embedding_service = embedding_service
         self.minio_client = minio_client
         self.minio_bucket = minio_bucket
+        self.minio_uploader = minio_uploader
+        # Place polygons are compiled once per camera
+        self.place_index = place_index_for(self.camera)
+        self.tracker = None
+        if config.persons.tracking.enabled:
+            self.tracker = PersonsTracker(
+                iou_threshold=config.persons.tracking.iou_threshold,
+                max_centroid_distance=config.persons.tracking.max_centroid_distance,
+                max_age_s=config.persons.tracking.max_age_s,
+                recheck_interval_s=config.persons.tracking.recheck_interval_s,
+            )
         if (self.camera.persons_roi) and setup_roi_schedulers:
             self.roi_notification_instances = [
                 ROITimeoutScheduler(roi_name, 4 * 60, None, None)
                 for roi_name in self.camera.persons_roi
             ]
 
-    def person_save_minio(self, person_image: Image.Image):
-        # Save to minio
+    def person_save_minio(self, person_crop: CropArtifact):
+        # Save to minio, crops already written under their MD5 are skipped
         try:
-            # Create a BytesIO buffer
-            img_buffer = BytesIO()
-            # Save the image to the buffer in the specified format
-            person_image.save(img_buffer, format="JPEG")
-            # Get the binary data
-            img_binary = img_buffer.getvalue()
-            md5_hash = hashlib.md5(img_binary).hexdigest()
-
+            if self.minio_uploader is not None:
+                self.minio_uploader.upload(
+                    self.minio_bucket,
+                    f"{self.camera_name}.{person_crop.md5}",
+                    person_crop.jpeg_bytes,
+                    content_type="image/jpeg",
+                )
+                return
             save_image_to_minio(
                 self.minio_client,
-                img_binary,
+                person_crop.jpeg_bytes,
                 self.minio_bucket,
-                f"{self.camera_name}.{md5_hash}",
+                f"{self.camera_name}.{person_crop.md5}",
             )
         except Exception as e:
             logging.error(
@@ -108,39 +143,55 @@ class PersonsAnalytic:
             )
 
     def person_get_overlapping_places(self, human_bbox):
-        percentage = 0.0425
-        # Unpack the crop coordinates
-        x1, y1, x2, y2 = human_bbox
-
-        # Calculate the height of the bounding box
-        bbox_height = y2 - y1
+        return self.persons_get_overlapping_places([human_bbox])[0]
 
-        # Calculate the height to crop
-        crop_height = int(bbox_height * percentage)
+    def persons_get_overlapping_places(self, human_bboxes):
+        """
+        Overlapping places of all persons of a frame in one query.
 
-        # Calculate the new coordinates for the bottom portion
-        new_y1 = y2 - crop_height
-        new_y2 = y2
+        :param human_bboxes: Person bboxes, x1, y1, x2, y2.
+        :return: List of overlapping place names per bbox.
+        """
+        percentage = 0.0425
+        human_bboxes = np.asarray(human_bboxes, dtype=np.float64).reshape(-1, 4)
+        if not self.camera.places:
+            return [[] for _ in range(len(human_bboxes))]
 
-        # Return the new bounding box coordinates
-        human_foot_bbox = [x1, new_y1, x2, new_y2]
+        # Height to crop of every bbox, the bottom portion of person is the foot bbox
+        crop_heights = np.trunc((human_bboxes[:, 3] - human_bboxes[:, 1]) * percentage)
+        human_foot_bboxes = human_bboxes.copy()
+        human_foot_bboxes[:, 1] = human_bboxes[:, 3] - crop_heights
 
         # Region of peron be calculated based of person foot bbox!
-        human_bbox_overallped_places = []
-        if self.camera.places:
-            human_bbox_overallped_places = check_place(
-                human_foot_bbox, self.camera.places
-            )
-        return human_bbox_overallped_places
+        return self.place_index.overlapping_many(human_foot_bboxes)
+
+    def person_face_characteristics(self, human_crop: CropArtifact, embeddings):
+        """
+        Analyze faces found by `represent` without detecting them again, only
+        the face crops are uploaded. Each face is still a separate analyze
+        request, the faces of the crop are analyzed concurrently.
+        """
+        faces_raw_b64 = [
+            CropArtifact(crop_facial_area(human_crop.image, e["facial_area"])).base64
+            for e in embeddings
+        ]
+        return self.deepface_client.analyze_faces(
+            faces_raw_b64, actions=self.deepface_actions
+        )
 
-    def person_scan_with_deepface(self, human_cropped_image: Image.Image, formatted_ts):
+    def person_scan_with_deepface(self, human_crop: CropArtifact, formatted_ts):
         """
         Scan a human face with deepface (Embeddings + Facial expression). Save results of scans to milvus DB.
+
+        Scan mode `separate` runs detection in both represent and analyze,
+        `combined` detects faces once and analyzes only the found faces, which
+        saves a face detection but not a request, `lazy` returns only
+        embeddings, characteristics are computed on demand.
         """
         # Scan with deepface
         try:
             embeddings = self.deepface_client.represent(
-                image_raw_b64=pillow_image_to_base64(human_cropped_image),
+                image_raw_b64=human_crop.base64,
                 model_name=self.deepface_model_name,
                 detector_backend=self.deepface_detector_name,
             )
@@ -149,10 +200,17 @@ class PersonsAnalytic:
                 return None
             logging.debug(f"[{self.camera_name}][Deepface] Found Face")
 
-            characteristics = self.deepface_client.analyze(
-                image_raw_b64=pillow_image_to_base64(human_cropped_image),
-                detector_backend=self.deepface_detector_name,
-            )
+            characteristics = None
+            if self.deepface_scan_mode == "separate":
+                characteristics = self.deepface_client.analyze(
+                    image_raw_b64=human_crop.base64,
+                    detector_backend=self.deepface_detector_name,
+                    actions=self.deepface_actions,
+                )
+            elif self.deepface_scan_mode == "combined":
+                characteristics = self.person_face_characteristics(
+                    human_crop, embeddings
+                )
             if characteristics:
                 logging.debug(f"[{self.camera_name}][Deepface] Found Characteristics")
 
@@ -171,7 +229,13 @@ class PersonsAnalytic:
             )
             return None
 
-    def save_person_scan_with_deepface(self, deepface_results, formatted_ts):
+    def save_person_scan_with_deepface(
+        self, deepface_results, formatted_ts, image_object=None
+    ):
+        """
+        :param image_object: MinIO object of the person crop, used to compute
+            characteristics on demand for faces saved in `lazy` scan mode.
+        """
         for res in deepface_results:
             try:
                 data = {
@@ -183,28 +247,61 @@ class PersonsAnalytic:
                     "model_name": self.deepface_model_name,
                     "detector_name": self.deepface_detector_name,
                     "processing_date": formatted_ts,
+                    "image_object": image_object,
+                    "attributes_pending": self.deepface_scan_mode == "lazy",
                 }
                 if "characteristics" in res:
-                    data["image_tags"]: json.loads(res["characteristics"])
+                    data["image_tags"] = res["characteristics"]
                 else:
-                    data["image_tags"]: {}
+                    data["image_tags"] = {}
 
-                milvus_res = self.milvus_client.insert(
+                self.milvus_writer.insert(
                     collection_name="master_faces",
                     data=[data],
                 )
-                logging.debug("Successfully inserted face to milvus 'master-faces'")
+                logging.debug("Successfully queued face for milvus 'master-faces'")
             except Exception as e:
                 logging.error(
                     "Could not insert face to milvus 'master-faces': "
                     + traceback.format_exc()
                 )
 
+    def person_alert_text(self, text, human_crop: Optional[CropArtifact]) -> str:
+        """
+        Alert text, in `lazy` deepface scan mode followed by the characteristics
+        of the faces of the person, which were not computed at ingest.
+        """
+        if self.deepface_scan_mode != "lazy" or human_crop is None:
+            return text
+        try:
+            characteristics = self.deepface_client.analyze(
+                image_raw_b64=human_crop.base64,
+                detector_backend=self.deepface_detector_name,
+                actions=self.deepface_actions,
+            )
+        except Exception as e:
+            logging.error(
+                f"[{self.camera_name}][Deepface] Could not analyze alerted person: {e}"
+            )
+            return text
+        faces = [
+            ", ".join(str(v) for v in res.get("characteristics", {}).values())
+            for res in self.deepface_client.combine_results(
+                [{"embedding": None, "facial_area": None}] * len(characteristics or []),
+                characteristics,
+            )
+        ]
+        faces = [face for face in faces if face]
+        if not faces:
+            return text
+        return f"{text} ({'; '.join(faces)})"
+
     def person_roi_slack_notification(
         self,
-        expanded_human_cropped_image: Image.Image,
+        expanded_human_crop: CropArtifact,
         human_bbox_overallped_places,
         timestamp,
+        human_crop: Optional[CropArtifact] = None,
     ):
         # Convert Unix timestamp to datetime object
         dt = datetime.fromtimestamp(timestamp)
@@ -230,26 +327,40 @@ class PersonsAnalytic:
                             "[ROI]: "
                             + f"Found people in nearby {place_overallped} at {formatted_ts}"
                         )
-                        place_roi.callback_start = lambda: self.slack_client.send_slack_media_text_message(
-                            [expanded_human_cropped_image],
-                            _(
-                                f"Found people in nearby {place_overallped} at {formatted_ts}"
-                            ),
+                        # Alerts of all regions of the camera are merged
+                        notification_key = self.camera_name
+                        place_roi.callback_start = lambda key=notification_key, place_overallped=place_overallped: persons_executor.submit(
+                            lambda: self.slack_client.notify(
+                                self.person_alert_text(
+                                    _(
+                                        f"Found people in nearby {place_overallped} at {formatted_ts}"
+                                    ),
+                                    human_crop,
+                                ),
+                                [expanded_human_crop],
+                                key=key,
+                            )
                         )
-                        place_roi.callback_end = lambda: self.slack_client.send_slack_text_message(
+                        place_roi.callback_end = lambda key=notification_key, place_overallped=place_overallped: self.slack_client.notify(
                             _(f"Person is no longer visible nearby {place_overallped}"),
+                            key=key,
                         )
                         place_roi.start()
 
-    def person_caption_action(self, expanded_human_cropped_image: Image.Image):
+    def person_caption_action(self, expanded_human_crop: CropArtifact):
         """
         Save in Milvus db what `people` at `given time` at `given location` at `given space` are doing.
 
         Returns caption text
         """
+        if self.florence_batcher is not None:
+            return self.florence_batcher.run_prompt(
+                expanded_human_crop.base64, "<DETAILED_CAPTION>"
+            )
+
         # Call human to to OD
         res_human_caption = self.florence_client.image_ocr_od_caption(
-            base64_image=pillow_image_to_base64(expanded_human_cropped_image),
+            base64_image=expanded_human_crop.base64,
             prompts=["<DETAILED_CAPTION>"],
         )
 
@@ -265,11 +376,14 @@ class PersonsAnalytic:
 
         logging.info(f"[Camera {self.camera_name}] | Person is captioned as: {caption}")
 
-        # Generate embedding
-        ollama_embedding_response = self.ollama_client.embeddings(
-            model=self.ollama_embedding_model, prompt=caption
-        )
-        embedding = ollama_embedding_response["embedding"]
+        # Generate embedding, repeated captions are served from the cache
+        if self.embedding_service is not None:
+            embedding = self.embedding_service.embed(caption)
+        else:
+            ollama_embedding_response = self.ollama_client.embeddings(
+                model=self.ollama_embedding_model, prompt=caption
+            )
+            embedding = ollama_embedding_response["embedding"]
 
         # Save to Milvus
         data = {
@@ -282,79 +396,159 @@ class PersonsAnalytic:
             "camera_space": ", ".join(human_bbox_overallped_places),
             "processing_timestamp": timestamp,
         }
-        milvus_res = self.milvus_client.insert(
+        self.milvus_writer.insert(
             collection_name="cctv_persons_action_captions",
             data=[data],
         )
         logging.debug(
-            "Successfully inserted caption of actions taken by human to milvus 'cctv_persons_action_captions'"
+            "Successfully queued caption of actions taken by human for milvus 'cctv_persons_action_captions'"
         )
 
-    def process_persons(
+    def person_enrichment(
         self,
-        image,
-        od_res_dict,
+        human_bbox,
+        human_crop: CropArtifact,
+        expanded_human_crop: CropArtifact,
+        human_bbox_overallped_places,
         formatted_ts,
         timestamp,
-        send_slack_notification=True,
         save_caption_to_milvus=True,
         save_deepface_to_milvus=True,
     ):
-        for index, label in enumerate(od_res_dict["res"]["labels"]):
-            if label == "person":
-                human_bbox = od_res_dict["res"]["bboxes"][index]
-                logging.info(
-                    f"[{self.camera_name}][Person Analytics] Found person in labels at [{index}]"
-                )
-                logging.info(
-                    f"[{self.camera_name}][Person Analytics] bbox " + str(human_bbox)
+        """
+        Save, caption and face scan a single person.
+
+        :return: [overlapping places, caption, deepface results] of the person.
+        """
+        try:
+            # Save person cropped image to minio
+            self.person_save_minio(human_crop)
+
+            # Caption person action and save in milvus
+            person_caption_action = self.person_caption_action(expanded_human_crop)
+            if save_caption_to_milvus:
+                self.save_person_caption_action_to_milvus(
+                    human_bbox_overallped_places, timestamp, person_caption_action
                 )
 
-                # Cut Using bbox
-                human_cropped_image = image.crop(human_bbox)
+            # Deepface scan for faces
+            deepface_results = self.person_scan_with_deepface(human_crop, formatted_ts)
 
-                expanded_human_cropped_image = expand_pillow_cropped_image(
-                    image, human_bbox
+            if save_deepface_to_milvus and deepface_results:
+                self.save_person_scan_with_deepface(
+                    deepface_results,
+                    formatted_ts,
+                    f"{self.camera_name}.{human_crop.md5}",
                 )
 
-                # Save person cropped image to minio
-                self.person_save_minio(human_cropped_image)
+            return [
+                human_bbox_overallped_places,
+                person_caption_action,
+                deepface_results,
+            ]
+        except Exception as e:
+            logging.error(
+                f"[{self.camera_name}][Person Analytics] Could not process person {human_bbox} "
+                + traceback.format_exc()
+            )
+            return None
 
-                # Grab overlapping places of person
-                human_bbox_overallped_places = self.person_get_overlapping_places(
-                    human_bbox
-                )
+    def process_persons(
+        self,
+        image,
+        od_res_dict,
+        formatted_ts,
+        timestamp,
+        send_slack_notification=True,
+        save_caption_to_milvus=True,
+        save_deepface_to_milvus=True,
+    ):
+        """
+        Process every person found in the frame. ROI notifications are checked
+        in order, per person enrichment (MinIO, caption, embedding, Deepface)
+        runs concurrently, at most `persons.max_concurrency_per_frame` persons
+        of the frame at once. With tracking enabled only persons of new tracks
+        and tracks due for a re-check are enriched.
+
+        :return: List of [overlapping places, caption, deepface results] per
+            person, caption and deepface results are None for persons which
+            were not enriched.
+        """
+        persons_bboxes = [
+            (index, od_res_dict["res"]["bboxes"][index])
+            for index, label in enumerate(od_res_dict["res"]["labels"])
+            if label == "person"
+        ]
+        persons_tracks = [(None, True)] * len(persons_bboxes)
+        if self.tracker is not None:
+            persons_tracks = self.tracker.update(
+                [human_bbox for _, human_bbox in persons_bboxes], timestamp
+            )
 
-                # Send notfications to slack
-                if send_slack_notification:  # Caption person action and save in milvus
-                    try:
-                        self.person_roi_slack_notification(
-                            expanded_human_cropped_image,
-                            human_bbox_overallped_places,
-                            timestamp,
-                        )
-                    except Exception as e:
-                        logging.error("Could not send slack notification" + str(e))
+        # Grab overlapping places of all persons at once
+        persons_places = self.persons_get_overlapping_places(
+            [human_bbox for _, human_bbox in persons_bboxes]
+        )
 
-                # Caption person action and save in milvus
-                person_caption_action = self.person_caption_action(
-                    expanded_human_cropped_image
-                )
-                if save_caption_to_milvus:
-                    self.save_person_caption_action_to_milvus(
-                        human_bbox_overallped_places, timestamp, person_caption_action
-                    )
+        frame_limit = threading.BoundedSemaphore(
+            config.persons.max_concurrency_per_frame
+        )
+        persons_pending = []
+        for (
+            (index, human_bbox),
+            (track_id, needs_enrichment),
+            human_bbox_overallped_places,
+        ) in zip(persons_bboxes, persons_tracks, persons_places):
+            logging.info(
+                f"[{self.camera_name}][Person Analytics] Found person in labels at [{index}], track {track_id}"
+            )
+            logging.info(
+                f"[{self.camera_name}][Person Analytics] bbox " + str(human_bbox)
+            )
 
-                # Deepface scan for faces
-                deepface_results = self.person_scan_with_deepface(
-                    human_cropped_image, formatted_ts
-                )
+            # Cut Using bbox, crops are encoded once and shared by all backends
+            human_crop = CropArtifact(image.crop(human_bbox))
 
-                if save_deepface_to_milvus and deepface_results:
-                    self.save_person_scan_with_deepface(deepface_results, formatted_ts)
+            expanded_human_crop = CropArtifact(
+                expand_pillow_cropped_image(image, human_bbox)
+            )
 
-                return [
-                    human_bbox_overallped_places,
-                    person_caption_action,
-                    deepface_results,
-                ]
+            # Send notfications to slack
+            if send_slack_notification:  # Caption person action and save in milvus
+                try:
+                    self.person_roi_slack_notification(
+                        expanded_human_crop,
+                        human_bbox_overallped_places,
+                        timestamp,
+                        human_crop,
+                    )
+                except Exception as e:
+                    logging.error("Could not send slack notification" + str(e))
+
+            if not needs_enrichment:
+                # Person already enriched for its track, keep only its places
+                metrics.inc("persons_enrichment_skipped", self.camera_name)
+                persons_pending.append([human_bbox_overallped_places, None, None])
+                continue
+
+            metrics.inc("persons_enriched", self.camera_name)
+            frame_limit.acquire()
+            person_future = persons_executor.submit(
+                self.person_enrichment,
+                human_bbox,
+                human_crop,
+                expanded_human_crop,
+                human_bbox_overallped_places,
+                formatted_ts,
+                timestamp,
+                save_caption_to_milvus,
+                save_deepface_to_milvus,
+            )
+            person_future.add_done_callback(lambda _: frame_limit.release())
+            persons_pending.append(person_future)
+
+        persons_results = [
+            future.result() if isinstance(future, Future) else future
+            for future in persons_pending
+        ]
+        return [res for res in persons_results if res is not None]
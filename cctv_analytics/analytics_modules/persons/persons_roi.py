@@ -1,26 +1,138 @@
+import heapq
+import itertools
+import logging
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.metrics import metrics
+
+
+class TimeoutScheduler:
+    """
+    Runs the timeouts of all regions on a single thread.
+
+    Deadlines are kept in a heap with one entry per key. Postponing a timeout
+    only updates its deadline in a dict, the stale heap entry is pushed back
+    with the new deadline when it comes up, so restarting a timeout on every
+    frame costs O(1) and an earlier deadline O(log n). Expired callbacks run
+    on a small executor, never on the scheduler thread.
+    """
+
+    def __init__(self, max_workers: int = 2, name: str = "roi_timeouts"):
+        self.name = name
+        self.max_workers = max_workers
+        self._heap = []
+        self._deadlines = {}
+        self._seq = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._executor = None
+        metrics.register_gauge(
+            f"{name}_active", lambda: {"total": len(self._deadlines)}
+        )
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._executor = ThreadPoolExecutor(
+                self.max_workers, thread_name_prefix=self.name
+            )
+            self._thread = threading.Thread(
+                target=self._run, name=self.name, daemon=True
+            )
+            self._thread.start()
+
+    def schedule(self, key, delay: float, callback):
+        """
+        Starts or postpones the timeout of the key, `callback` replaces the
+        previously scheduled one.
+        """
+        deadline = time.monotonic() + delay
+        with self._condition:
+            self._ensure_started()
+            current = self._deadlines.get(key)
+            self._deadlines[key] = (deadline, callback)
+            if current is None or deadline < current[0]:
+                heapq.heappush(self._heap, (deadline, next(self._seq), key))
+                if self._heap[0][2] is key:
+                    self._condition.notify()
+
+    def cancel(self, key):
+        with self._condition:
+            self._deadlines.pop(key, None)
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def _run_callback(self, callback):
+        try:
+            callback()
+        except Exception as e:
+            logging.error(f"[{self.name}] Timeout callback failed: {e}")
+
+    def _run(self):
+        with self._condition:
+            while True:
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                deadline, _, key = self._heap[0]
+                now = time.monotonic()
+                if deadline > now:
+                    self._condition.wait(deadline - now)
+                    continue
+
+                heapq.heappop(self._heap)
+                entry = self._deadlines.get(key)
+                if entry is None:
+                    continue  # Cancelled
+                if entry[0] > now:
+                    # Postponed, wait for the current deadline
+                    heapq.heappush(self._heap, (entry[0], next(self._seq), key))
+                    continue
+                del self._deadlines[key]
+                self._executor.submit(self._run_callback, entry[1])
+
+
+# Shared by ROI notifications of all cameras
+roi_timeouts = TimeoutScheduler()
 
 
 class ROITimeoutScheduler:
-    def __init__(self, region_name, timeout, callback_start, callback_end):
+    def __init__(
+        self,
+        region_name,
+        timeout,
+        callback_start,
+        callback_end,
+        scheduler: TimeoutScheduler = roi_timeouts,
+    ):
         """
         Initializes the TimeoutScheduler.
 
         :param timeout: Timeout duration in seconds.
         :param callback: Function to call when the timeout is reached.
+        :param scheduler: Scheduler running the timeout.
         """
         self.region_name = region_name
         self.timeout = timeout
         self.callback_start = callback_start
         self.callback_end = callback_end
-        self.timer = None
+        self.scheduler = scheduler
+        self.active = False
+        self._generation = 0
+        self._lock = threading.Lock()
 
-    def _run_callback_end(self):
+    def _run_callback_end(self, generation):
         """
-        Internal method to run the end callback.
+        Internal method to run the end callback, unless the timeout was
+        restarted after it expired.
         """
+        with self._lock:
+            if generation != self._generation or not self.active:
+                return
+            self.active = False
         self.callback_end()
-        self.timer = None
 
     def _run_callback_start(self):
         """
@@ -31,18 +143,24 @@ class ROITimeoutScheduler:
     def start(self):
         """
         Starts or restarts the timeout.
-        If a previous timeout is still running, it will be canceled.
+        If a previous timeout is still running, it will be postponed.
         """
-        if self.timer is None:
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            started = not self.active
+            self.active = True
+            self.scheduler.schedule(
+                self, self.timeout, lambda: self._run_callback_end(generation)
+            )
+        if started:
             self._run_callback_start()
-        self.cancel()  # Cancel any existing timer
-        self.timer = threading.Timer(self.timeout, self._run_callback_end)
-        self.timer.start()
 
     def cancel(self):
         """
         Cancels the currently running timeout, if any.
         """
-        if self.timer is not None:
-            self.timer.cancel()
-            self.timer = None
+        with self._lock:
+            self._generation += 1
+            self.active = False
+            self.scheduler.cancel(self)
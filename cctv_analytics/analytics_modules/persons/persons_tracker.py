@@ -0,0 +1,139 @@
+import itertools
+from typing import List, Tuple
+
+import numpy as np
+
+
+def bboxes_iou(bboxes_a: np.ndarray, bboxes_b: np.ndarray) -> np.ndarray:
+    """
+    Pairwise IoU of (N,4) and (M,4) arrays of x1, y1, x2, y2 boxes.
+
+    :return: (N,M) array.
+    """
+    x1 = np.maximum(bboxes_a[:, None, 0], bboxes_b[None, :, 0])
+    y1 = np.maximum(bboxes_a[:, None, 1], bboxes_b[None, :, 1])
+    x2 = np.minimum(bboxes_a[:, None, 2], bboxes_b[None, :, 2])
+    y2 = np.minimum(bboxes_a[:, None, 3], bboxes_b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (bboxes_a[:, 2] - bboxes_a[:, 0]) * (bboxes_a[:, 3] - bboxes_a[:, 1])
+    area_b = (bboxes_b[:, 2] - bboxes_b[:, 0]) * (bboxes_b[:, 3] - bboxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.divide(
+        intersection, union, out=np.zeros_like(intersection), where=union > 0
+    )
+
+
+class PersonsTracker:
+    """
+    Lightweight multi-object tracker of persons seen by a single camera.
+
+    Detections are matched to tracks greedily by IoU, detections overlapping
+    no track are matched by centroid distance (relative to the track bbox
+    diagonal). Unmatched detections start new tracks, tracks not seen for
+    `max_age_s` are dropped. A person needs enrichment when its track is born
+    and then every `recheck_interval_s`.
+    """
+
+    def __init__(
+        self,
+        iou_threshold: float = 0.3,
+        max_centroid_distance: float = 0.5,
+        max_age_s: float = 10.0,
+        recheck_interval_s: float = 60.0,
+    ):
+        self.iou_threshold = iou_threshold
+        self.max_centroid_distance = max_centroid_distance
+        self.max_age_s = max_age_s
+        self.recheck_interval_s = recheck_interval_s
+        self._ids = itertools.count(1)
+        self.track_ids = np.empty(0, dtype=np.int64)
+        self.bboxes = np.empty((0, 4), dtype=np.float64)
+        self.last_seen = np.empty(0, dtype=np.float64)
+        self.last_enriched = np.empty(0, dtype=np.float64)
+
+    def _cost_matrix(self, detections: np.ndarray) -> np.ndarray:
+        """
+        Cost of assigning detections to tracks, (tracks, detections) array.
+        IoU matches cost [0, 1), centroid matches [1, 2), impossible ones inf.
+        """
+        iou = bboxes_iou(self.bboxes, detections)
+        track_centroids = (self.bboxes[:, :2] + self.bboxes[:, 2:]) / 2
+        detection_centroids = (detections[:, :2] + detections[:, 2:]) / 2
+        track_diagonals = np.hypot(
+            self.bboxes[:, 2] - self.bboxes[:, 0], self.bboxes[:, 3] - self.bboxes[:, 1]
+        )
+        distances = np.linalg.norm(
+            track_centroids[:, None, :] - detection_centroids[None, :, :], axis=2
+        ) / np.maximum(track_diagonals[:, None], 1e-6)
+
+        cost = np.full(iou.shape, np.inf)
+        centroid_match = distances <= self.max_centroid_distance
+        cost[centroid_match] = 1.0 + distances[centroid_match]
+        iou_match = iou >= self.iou_threshold
+        cost[iou_match] = 1.0 - iou[iou_match]
+        return cost
+
+    def _match(self, detections: np.ndarray) -> List[Tuple[int, int]]:
+        if len(self.track_ids) == 0 or len(detections) == 0:
+            return []
+        cost = self._cost_matrix(detections)
+        matches = []
+        used_tracks, used_detections = set(), set()
+        for flat_index in np.argsort(cost, axis=None):
+            track_index, detection_index = np.unravel_index(flat_index, cost.shape)
+            if not np.isfinite(cost[track_index, detection_index]):
+                break
+            if track_index in used_tracks or detection_index in used_detections:
+                continue
+            used_tracks.add(track_index)
+            used_detections.add(detection_index)
+            matches.append((int(track_index), int(detection_index)))
+        return matches
+
+    def update(self, bboxes, timestamp: float) -> List[Tuple[int, bool]]:
+        """
+        :param bboxes: Person bboxes of the frame, x1, y1, x2, y2.
+        :param timestamp: Frame time in seconds.
+        :return: (track id, needs enrichment) per bbox, in input order.
+        """
+        # Forget tracks which were not seen for too long
+        alive = timestamp - self.last_seen <= self.max_age_s
+        self.track_ids = self.track_ids[alive]
+        self.bboxes = self.bboxes[alive]
+        self.last_seen = self.last_seen[alive]
+        self.last_enriched = self.last_enriched[alive]
+
+        detections = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+        results: List[Tuple[int, bool]] = [None] * len(detections)
+
+        matched_detections = set()
+        for track_index, detection_index in self._match(detections):
+            matched_detections.add(detection_index)
+            self.bboxes[track_index] = detections[detection_index]
+            self.last_seen[track_index] = timestamp
+            needs_enrichment = (
+                timestamp - self.last_enriched[track_index] >= self.recheck_interval_s
+            )
+            if needs_enrichment:
+                self.last_enriched[track_index] = timestamp
+            results[detection_index] = (
+                int(self.track_ids[track_index]),
+                bool(needs_enrichment),
+            )
+
+        # New tracks for unmatched detections
+        new_detections = [
+            index for index in range(len(detections)) if index not in matched_detections
+        ]
+        if new_detections:
+            new_ids = np.array(
+                [next(self._ids) for _ in new_detections], dtype=np.int64
+            )
+            self.track_ids = np.concatenate([self.track_ids, new_ids])
+            self.bboxes = np.concatenate([self.bboxes, detections[new_detections]])
+            now = np.full(len(new_detections), timestamp, dtype=np.float64)
+            self.last_seen = np.concatenate([self.last_seen, now])
+            self.last_enriched = np.concatenate([self.last_enriched, now])
+            for track_id, detection_index in zip(new_ids, new_detections):
+                results[detection_index] = (int(track_id), True)
+        return results
@@ -1,6 +1,7 @@
 from flask import Flask, request, jsonify
 from datetime import datetime, timedelta
 from api.functions import describe_current_cameras
+from utils.metrics import metrics
 
 
 class http_server:
@@ -21,5 +22,9 @@ class http_server:
                 200,
             )
 
+        @self.app.route("/metrics", methods=["GET"])
+        def metrics_snapshot():
+            return jsonify(metrics.snapshot()), 200
+
     def run(self):
         self.app.run(host=self.host, port=self.port)
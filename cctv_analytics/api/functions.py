@@ -1,11 +1,11 @@
 import logging
-from apis.florence_setup import FlorenceAPI
-from apis.deepface_setup import DeepfaceAPI
-from ollama import Client as OllamaClient
 import traceback
 
-from analytics_modules.persons.persons_analytics import PersonsAnalytic
+from apis.clients import deepface_client, florence_client, ollama_client
+
+from analytics_modules.analyze_images import persons_analytic_for
 from common import (
+    CropArtifact,
     pillow_image_to_base64,
     expand_pillow_cropped_image,
     grab_current_images,
@@ -17,18 +17,13 @@ from utils.config import genconf
 
 config = genconf()
 
-# Florence configuration
-florence_client = FlorenceAPI(config.florence.url)
-
-# Deepface configuration
-deepface_client = DeepfaceAPI(config.deepface.url)
+# Deepface configuration, clients are created on first use by the shared registry
 deepface_model_name = config.deepface.deepface_model_name
 deepface_detector_name = config.deepface.detector_name
 deepface_model_embeddings_dimmension = config.deepface.embedding_dim
 
-# Ollama client
+# Ollama summarization model
 ollama_summarize_model = config.ollama.summarize_model
-ollama_client = OllamaClient(host=config.ollama.host)
 
 
 def describe_current_cameras(additional_user_context="") -> str:
@@ -36,35 +31,29 @@ def describe_current_cameras(additional_user_context="") -> str:
     all_prompts = ""
     human_text_res = ""
     general_text_res = ""
-    for image_data in all_cameras_images:
-        od_rest_dict_list = florence_client.image_ocr_od_caption(
-            base64_image=pillow_image_to_base64(image_data.image),
-            prompts=["<OD>", "<DETAILED_CAPTION>"],
-        )
+    # Ask for objects and caption of every camera at once
+    all_cameras_results = florence_client().image_ocr_od_caption_many(
+        [
+            (pillow_image_to_base64(image_data.image), ["<OD>", "<DETAILED_CAPTION>"])
+            for image_data in all_cameras_images
+        ]
+    )
+    for image_data, od_rest_dict_list in zip(all_cameras_images, all_cameras_results):
         for od_res_dict in od_rest_dict_list:
             if od_res_dict["prompt"] == "<OD>":
                 od_res_dict["res"] = json.loads(od_res_dict["res"].replace("'", '"'))
                 for index, label in enumerate(od_res_dict["res"]["labels"]):
                     if label == "person":
                         try:
-                            human_bbox = od_res_dict[0]["res"]["bboxes"][index]
-                            pa = PersonsAnalytic(
-                                camera,
-                                None,
-                                florence_client,
-                                deepface_client,
-                                deepface_model_name,
-                                deepface_detector_name,
-                                None,
-                                None,
-                                None,
-                                None,
-                                None,
-                            )
+                            human_bbox = od_res_dict["res"]["bboxes"][index]
+                            # Instance of the camera shared with image analytics
+                            pa = persons_analytic_for(image_data.camera)
                             places = pa.person_get_overlapping_places(human_bbox)
                             caption = pa.person_caption_action(
-                                expand_pillow_cropped_image(
-                                    image_data.image, human_bbox
+                                CropArtifact(
+                                    expand_pillow_cropped_image(
+                                        image_data.image, human_bbox
+                                    )
                                 )
                             )
 
@@ -81,7 +70,7 @@ def describe_current_cameras(additional_user_context="") -> str:
     if len(all_prompts) == 0:
         return "No human was detected."
     else:
-        response = ollama_client.chat(
+        response = ollama_client().chat(
             model=ollama_summarize_model,
             options={
                 "temperature": 0.05,
@@ -1,10 +1,10 @@
 from utils.config import genconf
-import requests
 import json
 import traceback
 import logging
 
 from api.functions import describe_current_cameras
+from apis.http_transport import transport_for
 
 config = genconf()
 
@@ -40,7 +40,7 @@ def ask_assistant(user_message):
         "format": "json",
         "stream": False,
     }
-    response = requests.post(
+    response = transport_for("ollama").post(
         ollama_url + "/api/generate",
         headers={"Content-Type": "application/json"},
         json=data,
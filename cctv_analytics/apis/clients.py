@@ -0,0 +1,167 @@
+import threading
+from typing import Callable, Dict, Optional
+
+from minio import Minio
+from ollama import Client as OllamaClient
+from pymilvus import MilvusClient
+
+from apis.deepface_setup import DeepfaceAPI
+from apis.embedding_service import EmbeddingService
+from apis.florence_batcher import FlorenceBatcher
+from apis.florence_setup import FlorenceAPI
+from apis.influxdb_setup import InfluxAPI
+from apis.milvus_writer import MilvusWriter
+from apis.minio_setup import setup_minio
+from apis.minio_uploader import MinioUploader
+from apis.slack_setup import SlackAPI
+from apis.whispar_setup import WhisparAPI
+from apis.xtts_setup import XttsAPI
+from utils.audio_codec import ChunkCodec
+from utils.config import genconf
+
+_clients: Dict[str, object] = {}
+# One lock per client, so a factory waiting on the network only blocks
+# callers of the same client. Factories may use other clients.
+_construction_locks: Dict[str, threading.Lock] = {}
+_construction_locks_lock = threading.Lock()
+
+
+def _client(name: str, factory: Callable[[], object]):
+    """
+    Process-wide client, created by `factory` on first use and shared by the
+    image, audio, HTTP and Slack threads. Created clients are returned
+    without locking.
+    """
+    client = _clients.get(name)
+    if client is not None:
+        return client
+    with _construction_locks_lock:
+        lock = _construction_locks.setdefault(name, threading.Lock())
+    with lock:
+        if name not in _clients:
+            _clients[name] = factory()
+        return _clients[name]
+
+
+def milvus_client() -> MilvusClient:
+    config = genconf()
+    return _client(
+        "milvus", lambda: MilvusClient(uri=config.milvus.uri, token=config.milvus.token)
+    )
+
+
+def milvus_writer() -> MilvusWriter:
+    return _client(
+        "milvus_writer",
+        lambda: MilvusWriter(milvus_client(), genconf().milvus.writer),
+    )
+
+
+def minio_client() -> Minio:
+    config = genconf()
+    return _client(
+        "minio",
+        lambda: setup_minio(
+            config.minio.host,
+            config.minio.access_key,
+            config.minio.secret_key,
+            config.minio.location,
+            config.minio.bucket_name,
+        ),
+    )
+
+
+def minio_uploader() -> MinioUploader:
+    return _client(
+        "minio_uploader",
+        lambda: MinioUploader(minio_client(), genconf().minio.uploader),
+    )
+
+
+def ollama_client() -> OllamaClient:
+    return _client("ollama", lambda: OllamaClient(host=genconf().ollama.host))
+
+
+def embedding_service() -> EmbeddingService:
+    """Batched and cached embeddings of `ollama.embedding_model`."""
+    config = genconf()
+    return _client(
+        "embedding_service",
+        lambda: EmbeddingService(
+            ollama_client(),
+            config.ollama.embedding_model,
+            config.ollama.embeddings,
+            dim=config.ollama.embedding_dim,
+        ),
+    )
+
+
+def florence_client() -> FlorenceAPI:
+    config = genconf()
+    return _client(
+        "florence",
+        lambda: FlorenceAPI(
+            config.florence.url, max_concurrency=config.florence.max_concurrency
+        ),
+    )
+
+
+def florence_batcher() -> Optional[FlorenceBatcher]:
+    """Batcher of single-crop Florence prompts, None when batching is disabled."""
+    config = genconf()
+    if not config.florence.batching:
+        return None
+    return _client(
+        "florence_batcher",
+        lambda: FlorenceBatcher(
+            florence_client(),
+            max_batch=config.florence.batch_max_items,
+            max_wait_ms=config.florence.batch_max_wait_ms,
+        ),
+    )
+
+
+def deepface_client() -> DeepfaceAPI:
+    config = genconf()
+    return _client(
+        "deepface",
+        lambda: DeepfaceAPI(
+            config.deepface.url, max_concurrency=config.deepface.max_concurrency
+        ),
+    )
+
+
+def influx_client() -> InfluxAPI:
+    config = genconf()
+    return _client(
+        "influxdb",
+        lambda: InfluxAPI(
+            url=config.influxdb.api_url,
+            token=config.influxdb.token,
+            org=config.influxdb.org,
+            bucket=config.influxdb.bucket,
+        ),
+    )
+
+
+def slack_client() -> SlackAPI:
+    return _client("slack", lambda: SlackAPI(genconf().slack))
+
+
+def whispar_client() -> WhisparAPI:
+    config = genconf()
+    return _client(
+        "whispar",
+        lambda: WhisparAPI(
+            config.whispar.api_url,
+            config.whispar.api_key,
+            max_concurrency=config.whispar.max_concurrency,
+            codec=ChunkCodec(
+                config.whispar.chunk_format, config.whispar.encoder_processes
+            ),
+        ),
+    )
+
+
+def xtts_client() -> XttsAPI:
+    return _client("xtts", lambda: XttsAPI(genconf().xtts.api_url))
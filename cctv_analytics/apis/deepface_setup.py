@@ -1,7 +1,20 @@
-import requests
 import base64
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from apis.http_transport import HttpTransport, transport_for
+
+DEFAULT_ACTIONS = ["age", "gender", "emotion", "race"]
+
+# Result keys of deepface analyze kept per requested action
+ACTION_CHARACTERISTICS = {
+    "age": "age",
+    "gender": "dominant_gender",
+    "emotion": "dominant_emotion",
+    "race": "dominant_race",
+}
 
 
 def encode_image(image_path_l):
@@ -11,8 +24,20 @@ def encode_image(image_path_l):
 
 
 class DeepfaceAPI:
-    def __init__(self, url):
+    def __init__(
+        self,
+        url,
+        transport: Optional[HttpTransport] = None,
+        max_concurrency: int = 4,
+    ):
+        """
+        :param max_concurrency: Maximum number of faces analyzed at once.
+        """
         self._url = url
+        self.transport = transport or transport_for("deepface")
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="deepface"
+        )
 
     def represent(
         self, image_raw_b64, model_name="Facenet", detector_backend="mtcnn"
@@ -23,7 +48,7 @@ class DeepfaceAPI:
             "model_name": model_name,
             "detector_backend": detector_backend,
         }
-        res = requests.post(f"{self._url}/represent", json=body)
+        res = self.transport.post(f"{self._url}/represent", json=body)
         if res.status_code == 200:
             try:
                 logging.debug(res)
@@ -33,14 +58,16 @@ class DeepfaceAPI:
                 return None
         return None
 
-    def analyze(self, image_raw_b64, detector_backend="mtcnn") -> list:
+    def analyze(
+        self, image_raw_b64, detector_backend="mtcnn", actions=DEFAULT_ACTIONS
+    ) -> list:
         imageb64 = "data:image/jpeg;base64," + str(image_raw_b64)
         body = {
             "img_path": imageb64,
             "detector_backend": detector_backend,
-            "actions": ["age", "gender", "emotion", "race"],
+            "actions": actions,
         }
-        res = requests.post(f"{self._url}/analyze", json=body)
+        res = self.transport.post(f"{self._url}/analyze", json=body)
         if res.status_code == 200:
             try:
                 logging.debug(res)
@@ -51,6 +78,28 @@ class DeepfaceAPI:
                 return None
         return None
 
+    def analyze_faces(
+        self, faces_raw_b64: List[str], actions=DEFAULT_ACTIONS
+    ) -> List[Optional[dict]]:
+        """
+        Analyze faces which were already detected and cropped, face detection
+        is skipped on the server.
+
+        The analyze endpoint takes a single image, so every face is still its
+        own request. Requests of the faces are sent concurrently, the latency
+        is that of the slowest face but the number of round trips is the same.
+
+        :return: Analysis per face in input order, None when it failed.
+        """
+
+        def analyze_face(face_raw_b64):
+            res = self.analyze(face_raw_b64, detector_backend="skip", actions=actions)
+            return res[0] if res else None
+
+        if len(faces_raw_b64) == 1:
+            return [analyze_face(faces_raw_b64[0])]
+        return list(self._executor.map(analyze_face, faces_raw_b64))
+
     def combine_results(self, embeddings, characteristics):
         results = []
         for e in embeddings:
@@ -59,16 +108,13 @@ class DeepfaceAPI:
             )
         if characteristics is not None:
             for i, c in enumerate(characteristics):
-                valuable_characteristics = [
-                    "age",
-                    "dominant_emotion",
-                    "dominant_gender",
-                    "dominant_race",
-                ]
+                if c is None:
+                    continue
                 try:
                     results[i]["characteristics"] = {}
-                    for v in valuable_characteristics:
-                        results[i]["characteristics"][v] = c[v]
+                    for v in ACTION_CHARACTERISTICS.values():
+                        if v in c:
+                            results[i]["characteristics"][v] = c[v]
                 except Exception as e:
                     logging.warning("Could not get characteristics")
         return results
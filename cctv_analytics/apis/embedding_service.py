@@ -0,0 +1,227 @@
+import os
+import atexit
+import queue
+import hashlib
+import logging
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+from ollama import Client as OllamaClient
+
+from utils.config import EmbeddingServiceConfig
+from utils.metrics import metrics
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Texts differing only in case or whitespace share an embedding."""
+    return " ".join((text or "").split()).casefold()
+
+
+def embedding_key(model: str, text: str) -> bytes:
+    # Hex digest, trailing NUL bytes would be stripped by the memmap store
+    return (
+        hashlib.sha1(f"{model}\0{normalize_text(text)}".encode()).hexdigest().encode()
+    )
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache of embeddings keyed by (model, normalized text).
+
+    With `persist_path` set, embeddings of `dim` dimensions are also kept in
+    memory-mapped files (`<path>.keys` and `<path>.vectors`) with a slot per
+    cached entry, so the cache survives restarts. Evicted entries free their
+    slot for the next one.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        dim: Optional[int] = None,
+        persist_path: Optional[str] = None,
+    ):
+        self.capacity = capacity
+        self.dim = dim
+        self._entries: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._slots: Dict[bytes, int] = {}
+        self._free_slots: List[int] = []
+        self._lock = threading.Lock()
+        self._keys = None
+        self._vectors = None
+        if persist_path and dim:
+            self._open_store(persist_path)
+
+    def _open_store(self, persist_path: str):
+        os.makedirs(os.path.dirname(persist_path) or ".", exist_ok=True)
+        keys_path, vectors_path = f"{persist_path}.keys", f"{persist_path}.vectors"
+        expected_size = self.capacity * self.dim * 4
+        exists = (
+            os.path.exists(keys_path)
+            and os.path.exists(vectors_path)
+            and os.path.getsize(vectors_path) == expected_size
+        )
+        mode = "r+" if exists else "w+"
+        self._keys = np.memmap(
+            keys_path, dtype="S40", mode=mode, shape=(self.capacity,)
+        )
+        self._vectors = np.memmap(
+            vectors_path, dtype=np.float32, mode=mode, shape=(self.capacity, self.dim)
+        )
+        for slot, key in enumerate(self._keys):
+            key = bytes(key)
+            if key:
+                self._entries[key] = self._vectors[slot]
+                self._slots[key] = slot
+            else:
+                self._free_slots.append(slot)
+        logging.info(
+            f"[Embeddings] Loaded {len(self._entries)} cached embeddings from {persist_path}"
+        )
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+            return vector
+
+    def put(self, key: bytes, embedding: List[float]):
+        vector = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            if len(self._entries) >= self.capacity:
+                evicted, _ = self._entries.popitem(last=False)
+                slot = self._slots.pop(evicted, None)
+                if slot is not None:
+                    self._keys[slot] = b""
+                    self._free_slots.append(slot)
+            if self._keys is not None and len(vector) == self.dim and self._free_slots:
+                slot = self._free_slots.pop()
+                self._vectors[slot] = vector
+                self._keys[slot] = key
+                self._slots[key] = slot
+                vector = self._vectors[slot]
+            self._entries[key] = vector
+
+    def flush(self):
+        if self._keys is not None:
+            self._vectors.flush()
+            self._keys.flush()
+
+
+class EmbeddingService:
+    """
+    Text embeddings of a single Ollama model.
+
+    Cached embeddings are returned right away. Other texts are collected until
+    `batch_max_items` of them are pending or the oldest one waited
+    `batch_max_wait_ms`, equal texts of a batch are embedded once and the
+    distinct ones concurrently.
+
+    Texts go to the `embeddings` endpoint, like the vectors already stored in
+    Milvus. The batched `embed` endpoint returns L2-normalized vectors whose
+    inner products are not comparable with the stored ones under the IP
+    metric of the collections.
+    """
+
+    def __init__(
+        self,
+        ollama_client: OllamaClient,
+        model: str,
+        service_config: EmbeddingServiceConfig = EmbeddingServiceConfig(),
+        dim: Optional[int] = None,
+    ):
+        self.ollama_client = ollama_client
+        self.model = model
+        self.config = service_config
+        self.cache = EmbeddingCache(
+            service_config.cache_size, dim, service_config.persist_path
+        )
+        self._queue: queue.Queue = queue.Queue()
+        self._executor = ThreadPoolExecutor(
+            max_workers=service_config.max_concurrency, thread_name_prefix="embedding"
+        )
+        self._last_flush = time.monotonic()
+        self._thread = threading.Thread(
+            target=self._run, name="embedding-batcher", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.cache.flush)
+        metrics.register_gauge(
+            "embedding_cache_size", lambda: {self.model: len(self.cache)}
+        )
+
+    def submit(self, text: str) -> Future:
+        """
+        :return: Future resolving to the embedding as a list of floats.
+        """
+        future = Future()
+        key = embedding_key(self.model, text)
+        vector = self.cache.get(key)
+        if vector is not None:
+            metrics.inc("embedding_cache_hits", self.model)
+            future.set_result(vector.tolist())
+            return future
+        metrics.inc("embedding_cache_misses", self.model)
+        self._queue.put((key, text, future))
+        return future
+
+    def embed(self, text: str) -> List[float]:
+        return self.submit(text).result()
+
+    def _collect_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.config.batch_max_wait_ms / 1000
+        while len(batch) < self.config.batch_max_items:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _embed_one(self, key: bytes, text: str, futures: List[Future]):
+        try:
+            response = self.ollama_client.embeddings(model=self.model, prompt=text)
+            embedding = list(response["embedding"])
+        except Exception as e:
+            logging.error("[Embeddings] Could not embed text " + traceback.format_exc())
+            for future in futures:
+                future.set_exception(e)
+            return
+        self.cache.put(key, embedding)
+        for future in futures:
+            future.set_result(embedding)
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            # Texts with equal keys are embedded once
+            pending: "OrderedDict[bytes, list]" = OrderedDict()
+            for key, text, future in batch:
+                pending.setdefault(key, [text, []])[1].append(future)
+
+            metrics.inc("embedding_batches", self.model)
+            metrics.inc("embedding_batched_texts", self.model, len(pending))
+            # Every future is resolved, with an exception when its text failed
+            list(
+                self._executor.map(
+                    lambda item: self._embed_one(item[0], *item[1]), pending.items()
+                )
+            )
+
+            if time.monotonic() - self._last_flush >= self.config.flush_interval_s:
+                self.cache.flush()
+                self._last_flush = time.monotonic()
@@ -0,0 +1,88 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional
+
+from apis.florence_setup import FlorenceAPI
+from utils.metrics import metrics
+
+
+class FlorenceBatcher:
+    """
+    Micro-batches single-crop Florence prompts (person captions, plate OCR)
+    coming from all cameras.
+
+    Requests are collected until `max_batch` of them are pending or the oldest
+    one waited `max_wait_ms`, then sent together as a burst of single-crop
+    requests over the pooled Florence connections. The chat completions API
+    takes one image per request, so this saves no round trips and only helps
+    a server that batches concurrent requests on the GPU, at the cost of up
+    to `max_wait_ms` of latency. Every caller gets a future resolving to the
+    result of its own crop.
+    """
+
+    def __init__(
+        self, florence_client: FlorenceAPI, max_batch: int = 8, max_wait_ms: int = 20
+    ):
+        self.florence_client = florence_client
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_ms / 1000
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="florence-batcher", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, base64_image: str, prompt: str) -> Future:
+        """
+        :return: Future resolving to the Florence response text or None.
+        """
+        future = Future()
+        self._queue.put((base64_image, prompt, future))
+        return future
+
+    def run_prompt(self, base64_image: str, prompt: str) -> Optional[str]:
+        return self.submit(base64_image, prompt).result()
+
+    def _collect_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_s
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    @staticmethod
+    def _resolve(caller_future: Future, florence_future: Future):
+        try:
+            caller_future.set_result(florence_future.result())
+        except Exception as e:
+            caller_future.set_exception(e)
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            metrics.inc("florence_batches")
+            metrics.inc("florence_batched_requests", value=len(batch))
+            logging.debug(f"[Florence] Sending batch of {len(batch)} crops")
+            for base64_image, prompt, caller_future in batch:
+                try:
+                    florence_future = self.florence_client.submit_prompt(
+                        base64_image, prompt
+                    )
+                except Exception as e:
+                    logging.error(f"[Florence] Could not submit prompt: {e}")
+                    caller_future.set_exception(e)
+                    continue
+                florence_future.add_done_callback(
+                    lambda done, caller_future=caller_future: self._resolve(
+                        caller_future, done
+                    )
+                )
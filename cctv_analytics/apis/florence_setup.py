@@ -1,11 +1,26 @@
-import requests
 import base64
 import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from apis.http_transport import HttpTransport, transport_for
 
 
 class FlorenceAPI:
-    def __init__(self, api_url: str):
+    def __init__(
+        self,
+        api_url: str,
+        transport: Optional[HttpTransport] = None,
+        max_concurrency: int = 4,
+    ):
+        """
+        :param max_concurrency: Maximum number of prompts sent to Florence at once.
+        """
         self.api_url = api_url
+        self.transport = transport or transport_for("florence")
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="florence"
+        )
 
     def image_analytics_per_prompt(self, base64_image, prompt):
         headers = {"Content-Type": "application/json", "Authorization": f"Bearer none"}
@@ -29,7 +44,7 @@ class FlorenceAPI:
             "max_tokens": 300,
         }
 
-        response = requests.post(
+        response = self.transport.post(
             f"{self.api_url}/v1/chat/completions",
             headers=headers,
             json=payload,
@@ -46,8 +61,29 @@ class FlorenceAPI:
             )
         return None
 
+    def submit_prompt(self, base64_image, prompt) -> Future:
+        """
+        Send a single prompt on the Florence pool without waiting for the result.
+        """
+        return self._executor.submit(
+            self.image_analytics_per_prompt, base64_image, prompt
+        )
+
+    @staticmethod
+    def _prompts_results(prompts, results):
+        return [
+            {
+                "prompt": prompt,
+                "res": curr_res,
+            }
+            for prompt, curr_res in zip(prompts, results)
+            if curr_res is not None
+        ]
+
     def image_ocr_od_caption(self, image_path=None, base64_image=None, prompts=[]):
         """
+        Prompts of the image are sent concurrently, results keep prompt order.
+
         prompts: List from ["<OCR>", "<OD>", "<DETAILED_CAPTION>"]
         """
         if prompts == []:
@@ -61,14 +97,33 @@ class FlorenceAPI:
             # Getting the base64 string
             base64_image = encode_image(image_path)
         if base64_image:
-            res = []
-            for prompt in prompts:
-                curr_res = self.image_analytics_per_prompt(base64_image, prompt)
-                if curr_res is not None:
-                    res.append(
-                        {
-                            "prompt": prompt,
-                            "res": curr_res,
-                        }
-                    )
-            return res
+            if len(prompts) == 1:
+                results = [self.image_analytics_per_prompt(base64_image, prompts[0])]
+            else:
+                results = self._executor.map(
+                    lambda prompt: self.image_analytics_per_prompt(
+                        base64_image, prompt
+                    ),
+                    prompts,
+                )
+            return self._prompts_results(prompts, results)
+
+    def image_ocr_od_caption_many(
+        self, images_prompts: List[Tuple[str, List[str]]]
+    ) -> List[list]:
+        """
+        Run prompts of many images, every (image, prompt) pair is sent concurrently.
+
+        :param images_prompts: List of (base64_image, prompts).
+        :return: Results of `image_ocr_od_caption` per image, in input order.
+        """
+        futures = [
+            [self.submit_prompt(base64_image, prompt) for prompt in prompts]
+            for base64_image, prompts in images_prompts
+        ]
+        return [
+            self._prompts_results(
+                prompts, [future.result() for future in image_futures]
+            )
+            for (base64_image, prompts), image_futures in zip(images_prompts, futures)
+        ]
@@ -0,0 +1,129 @@
+import logging
+import random
+import threading
+import time
+from typing import Dict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.config import HttpBackendConfig, genconf
+
+
+class HttpTransport:
+    """
+    Pooled HTTP client of a single model backend.
+
+    Requests go through a keep-alive connection pool with connect/read
+    timeouts. Connection errors and the `retry_statuses` of the backend
+    (429 and 5xx by default) are retried with exponential backoff and full
+    jitter. Concurrent requests are
+    limited per host, callers above the limit wait for a free slot. A slot is
+    held only while a request is in flight, not during the backoff.
+    """
+
+    def __init__(self, name: str, settings: HttpBackendConfig = HttpBackendConfig()):
+        self.name = name
+        self.settings = settings
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=settings.pool_size,
+            pool_block=True,
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._host_limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _host_limit(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(
+                    self.settings.max_concurrency
+                )
+            return self._host_limits[host]
+
+    def _backoff(self, attempt: int):
+        time.sleep(random.uniform(0, self.settings.backoff_s * (2**attempt)))
+
+    @staticmethod
+    def _rewind_files(kwargs):
+        """
+        File-like bodies were consumed by the failed attempt, send them again
+        from the beginning.
+        """
+        for value in (kwargs.get("files") or {}).values():
+            if hasattr(value, "seek"):
+                value.seek(0)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault(
+            "timeout", (self.settings.connect_timeout_s, self.settings.read_timeout_s)
+        )
+        host_limit = self._host_limit(url)
+        for attempt in range(self.settings.retries + 1):
+            last_attempt = attempt == self.settings.retries
+            if attempt > 0:
+                self._rewind_files(kwargs)
+            try:
+                with host_limit:
+                    response = self.session.request(method, url, **kwargs)
+            except requests.ConnectionError as e:
+                if last_attempt:
+                    raise
+                logging.warning(f"[HTTP][{self.name}] Connection error, retrying: {e}")
+            else:
+                if (
+                    response.status_code not in self.settings.retry_statuses
+                    or last_attempt
+                ):
+                    return response
+                logging.warning(
+                    f"[HTTP][{self.name}] Status {response.status_code}, retrying"
+                )
+            self._backoff(attempt)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+
+_transports: Dict[str, HttpTransport] = {}
+_transports_lock = threading.Lock()
+
+
+def backend_settings(name: str) -> HttpBackendConfig:
+    """
+    Settings of the backend, fields set in `http.backends.<name>` override
+    those of `http.default`, the others are inherited from it.
+    """
+    http_config = genconf().http
+    settings = http_config.default
+    if name in http_config.backends:
+        settings = settings.model_copy(
+            update=http_config.backends[name].model_dump(exclude_unset=True)
+        )
+    return settings
+
+
+def transport_for(name: str, **overrides) -> HttpTransport:
+    """
+    Process-wide transport of the backend, created on first use with its
+    `backend_settings`.
+
+    :param overrides: Settings applied on top of the config, e.g. a
+        concurrency limit derived from the backend's own config. Only the
+        call creating the transport applies them.
+    """
+    with _transports_lock:
+        if name not in _transports:
+            settings = backend_settings(name)
+            if overrides:
+                settings = settings.model_copy(update=overrides)
+            _transports[name] = HttpTransport(name, settings)
+        return _transports[name]
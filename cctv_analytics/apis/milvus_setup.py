@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import traceback
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from pymilvus import MilvusClient
+from pymilvus.client.types import LoadState
+
+from utils.config import MilvusConfig
+
+CollectionSpec = namedtuple("CollectionSpec", ["name", "schema", "index_params"])
+
+
+def wait_for_collection_loaded(
+    client_milvus: MilvusClient,
+    collection_name: str,
+    timeout_s: float = 60.0,
+    poll_interval_s: float = 0.2,
+) -> bool:
+    """Poll `get_load_state` until the collection is loaded or `timeout_s` passes."""
+    deadline = time.monotonic() + timeout_s
+    while True:
+        res = client_milvus.get_load_state(collection_name=collection_name)
+        if res["state"] == LoadState.Loaded:
+            logging.info(f"[Milvus] Collection {collection_name} loaded")
+            return True
+        if time.monotonic() >= deadline:
+            logging.error(
+                f"[Milvus] Collection {collection_name} not loaded after {timeout_s}s: {res}"
+            )
+            return False
+        time.sleep(poll_interval_s)
+
+
+def missing_fields(client_milvus: MilvusClient, spec: CollectionSpec) -> List[str]:
+    """Fields of the spec the existing collection lacks."""
+    existing = {
+        field["name"]
+        for field in client_milvus.describe_collection(spec.name)["fields"]
+    }
+    return [field.name for field in spec.schema.fields if field.name not in existing]
+
+
+def create_collection(
+    client_milvus: MilvusClient,
+    spec: CollectionSpec,
+    timeout_s: float = 60.0,
+    poll_interval_s: float = 0.2,
+    check_schema: bool = True,
+) -> bool:
+    """
+    Create the collection unless it exists and wait until it is loaded.
+
+    :param check_schema: Compare the schema of an existing collection with the
+        spec and warn about missing fields.
+    """
+    exists = client_milvus.has_collection(spec.name)
+
+    if exists:
+        logging.info("Collection " + spec.name + " exists")
+        if check_schema:
+            missing = missing_fields(client_milvus, spec)
+            if missing:
+                logging.warning(
+                    f"[Milvus] Collection {spec.name} lacks fields {', '.join(missing)}"
+                )
+        state = client_milvus.get_load_state(collection_name=spec.name)["state"]
+        if state == LoadState.Loaded:
+            return True
+        if state == LoadState.NotLoad:
+            client_milvus.load_collection(collection_name=spec.name)
+    else:
+        client_milvus.create_collection(
+            collection_name=spec.name,
+            schema=spec.schema,
+            index_params=spec.index_params,
+        )
+    return wait_for_collection_loaded(
+        client_milvus, spec.name, timeout_s, poll_interval_s
+    )
+
+
+def schema_fingerprint(uri: str, specs: List[CollectionSpec]) -> str:
+    definition = [uri] + [
+        [spec.name, spec.schema.to_dict(), list(spec.index_params)]
+        for spec in sorted(specs, key=lambda spec: spec.name)
+    ]
+    return hashlib.sha1(
+        json.dumps(definition, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def bootstrap_collections(
+    client_milvus: MilvusClient,
+    specs: List[CollectionSpec],
+    milvus_config: MilvusConfig,
+) -> bool:
+    """
+    Create all collections concurrently and wait until they are loaded.
+
+    The fingerprint of the schemas is cached in `bootstrap.cache_file` after a
+    successful bootstrap. Later startups with the same schemas still check
+    that every collection exists and is loaded, but skip comparing the
+    schemas of existing collections with the specs.
+
+    :return: True when all collections are ready.
+    """
+    bootstrap_config = milvus_config.bootstrap
+    fingerprint = schema_fingerprint(milvus_config.uri, specs)
+    cache_file = bootstrap_config.cache_file
+    unchanged = False
+    if cache_file and os.path.exists(cache_file):
+        try:
+            with open(cache_file) as f:
+                unchanged = json.load(f).get("fingerprint") == fingerprint
+        except Exception as e:
+            logging.warning(f"[Milvus] Could not read {cache_file}: {e}")
+    if unchanged:
+        logging.info("[Milvus] Schemas unchanged, skipping schema checks")
+
+    def create(spec: CollectionSpec) -> bool:
+        try:
+            return create_collection(
+                client_milvus,
+                spec,
+                bootstrap_config.timeout_s,
+                bootstrap_config.poll_interval_s,
+                check_schema=not unchanged,
+            )
+        except Exception as e:
+            logging.error(
+                f"[Milvus] Could not create {spec.name}: " + traceback.format_exc()
+            )
+            return False
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max(1, len(specs))) as executor:
+        ready = all(list(executor.map(create, specs)))
+    logging.info(
+        f"[Milvus] Bootstrap of {len(specs)} collections took {time.monotonic() - start:.2f}s"
+    )
+
+    if ready and cache_file and not unchanged:
+        try:
+            os.makedirs(os.path.dirname(cache_file) or ".", exist_ok=True)
+            with open(cache_file, "w") as f:
+                json.dump({"fingerprint": fingerprint}, f)
+        except OSError as e:
+            logging.warning(f"[Milvus] Could not write {cache_file}: {e}")
+    return ready
@@ -0,0 +1,204 @@
+import atexit
+import json
+import logging
+import threading
+import time
+import traceback
+from typing import Dict, List
+
+from pymilvus import MilvusClient
+
+from utils.config import MilvusWriterConfig
+from utils.metrics import metrics
+
+
+def estimate_row_size(row: dict) -> int:
+    """Approximate size of a row in the insert request, vectors as float32."""
+    size = 0
+    for value in row.values():
+        if isinstance(value, (str, bytes)):
+            size += len(value)
+        elif isinstance(value, (list, tuple)):
+            size += 4 * len(value)
+        elif isinstance(value, dict):
+            size += len(json.dumps(value))
+        else:
+            size += 8
+    return size
+
+
+class CollectionBuffer:
+    def __init__(self):
+        self.rows: List[dict] = []
+        self.size = 0
+        self.first_row_at = 0.0
+
+    def append(self, row: dict):
+        if not self.rows:
+            self.first_row_at = time.monotonic()
+        self.rows.append(row)
+        self.size += estimate_row_size(row)
+
+
+class MilvusWriter:
+    """
+    Buffers rows per collection and inserts them into Milvus in bulk.
+
+    A buffer is flushed by a background thread when it holds `max_rows` rows,
+    `max_bytes` bytes or its oldest row waited `max_age_s`. Failed inserts are
+    retried with exponential backoff, rows of an insert failing all retries
+    are put back to the buffer for the next flush as long as it holds at most
+    `max_buffered_rows`. Remaining rows are flushed on `close`, which is also
+    registered to run at interpreter exit.
+    """
+
+    def __init__(
+        self,
+        milvus_client: MilvusClient,
+        writer_config: MilvusWriterConfig = MilvusWriterConfig(),
+        name: str = "milvus",
+    ):
+        self.milvus_client = milvus_client
+        self.config = writer_config
+        self.name = name
+        self._buffers: Dict[str, CollectionBuffer] = {}
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name=f"{name}-writer", daemon=True
+        )
+        self._thread.start()
+        metrics.register_gauge(f"{name}_buffered_rows", self.buffered_rows)
+        atexit.register(self.close)
+
+    def buffered_rows(self) -> Dict[str, int]:
+        with self._condition:
+            return {
+                collection_name: len(buffer.rows)
+                for collection_name, buffer in self._buffers.items()
+            }
+
+    def insert(self, collection_name: str, data: List[dict]):
+        """Queue rows for insertion, same arguments as `MilvusClient.insert`."""
+        if self._closed:
+            if not self._insert(collection_name, data):
+                self._count_failed(collection_name, data)
+            return
+        with self._condition:
+            buffer = self._buffers.setdefault(collection_name, CollectionBuffer())
+            for row in data:
+                buffer.append(row)
+            if self._is_full(buffer):
+                self._condition.notify()
+
+    def _is_full(self, buffer: CollectionBuffer) -> bool:
+        return (
+            len(buffer.rows) >= self.config.max_rows
+            or buffer.size >= self.config.max_bytes
+        )
+
+    def _take_due(self, force: bool = False) -> Dict[str, List[dict]]:
+        """Remove buffers due for a flush, must hold the condition."""
+        now = time.monotonic()
+        due = {}
+        for collection_name, buffer in self._buffers.items():
+            if buffer.rows and (
+                force
+                or self._is_full(buffer)
+                or now - buffer.first_row_at >= self.config.max_age_s
+            ):
+                due[collection_name] = buffer.rows
+        for collection_name in due:
+            self._buffers[collection_name] = CollectionBuffer()
+        return due
+
+    def _next_timeout(self) -> float:
+        """Time until the oldest buffered row reaches `max_age_s`."""
+        first_rows_at = [
+            buffer.first_row_at for buffer in self._buffers.values() if buffer.rows
+        ]
+        if not first_rows_at:
+            return self.config.max_age_s
+        return max(0.0, min(first_rows_at) + self.config.max_age_s - time.monotonic())
+
+    def _insert(self, collection_name: str, rows: List[dict]) -> bool:
+        """:return: False when the insert failed after all retries."""
+        start = time.monotonic()
+        for attempt in range(self.config.retries + 1):
+            try:
+                self.milvus_client.insert(collection_name=collection_name, data=rows)
+                break
+            except Exception as e:
+                if attempt == self.config.retries:
+                    logging.error(
+                        f"[Milvus] Could not insert {len(rows)} rows to '{collection_name}': "
+                        + traceback.format_exc()
+                    )
+                    return False
+                logging.warning(
+                    f"[Milvus] Insert of {len(rows)} rows to '{collection_name}' failed, retrying: {e}"
+                )
+                time.sleep(self.config.retry_backoff_s * 2**attempt)
+        metrics.inc(f"{self.name}_inserted_rows", collection_name, len(rows))
+        metrics.inc(f"{self.name}_inserts", collection_name)
+        metrics.set(
+            f"{self.name}_insert_latency_s", collection_name, time.monotonic() - start
+        )
+        logging.debug(f"[Milvus] Inserted {len(rows)} rows to '{collection_name}'")
+        return True
+
+    def _count_failed(self, collection_name: str, rows: List[dict]):
+        metrics.inc(f"{self.name}_failed_rows", collection_name, len(rows))
+        logging.error(f"[Milvus] Dropped {len(rows)} rows of '{collection_name}'")
+
+    def _requeue(self, collection_name: str, rows: List[dict]):
+        """Put rows of a failed insert in front of the buffer for the next flush."""
+        with self._condition:
+            buffer = self._buffers.setdefault(collection_name, CollectionBuffer())
+            if (
+                self._closed
+                or len(buffer.rows) + len(rows) > self.config.max_buffered_rows
+            ):
+                self._count_failed(collection_name, rows)
+                return
+            requeued = CollectionBuffer()
+            for row in rows + buffer.rows:
+                requeued.append(row)
+            self._buffers[collection_name] = requeued
+        metrics.inc(f"{self.name}_requeued_rows", collection_name, len(rows))
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if self._closed:
+                    return
+                due = self._take_due()
+                if not due:
+                    self._condition.wait(self._next_timeout())
+                    continue
+            self._insert_due(due)
+
+    def _insert_due(self, due: Dict[str, List[dict]]):
+        # Buffers may grow past `max_rows` while a flush is running
+        step = self.config.max_rows
+        for collection_name, rows in due.items():
+            for start in range(0, len(rows), step):
+                chunk = rows[start : start + step]
+                if not self._insert(collection_name, chunk):
+                    self._requeue(collection_name, chunk)
+
+    def flush(self):
+        """Insert all buffered rows now."""
+        with self._condition:
+            due = self._take_due(force=True)
+        self._insert_due(due)
+
+    def close(self):
+        """Stop the background thread and flush remaining rows."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self.flush()
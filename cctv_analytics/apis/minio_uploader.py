@@ -0,0 +1,166 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from io import BytesIO
+from typing import Union
+
+from minio import Minio
+
+from utils.config import MinioUploaderConfig
+from utils.metrics import metrics
+
+MinioUpload = namedtuple(
+    "MinioUpload", ["bucket_name", "object_name", "data", "content_type", "queued_at"]
+)
+
+
+class RecentKeys:
+    """Bounded set of recently written object keys, oldest are forgotten first."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._keys: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key: str) -> bool:
+        """:return: False when the key was already present."""
+        with self._lock:
+            if key in self._keys:
+                self._keys.move_to_end(key)
+                return False
+            self._keys[key] = None
+            if len(self._keys) > self.capacity:
+                self._keys.popitem(last=False)
+            return True
+
+    def discard(self, key: str):
+        with self._lock:
+            self._keys.pop(key, None)
+
+
+class MinioUploader:
+    """
+    Uploads objects to MinIO from a pool of background threads.
+
+    Uploads are put on a bounded queue, when it is full new ones are dropped
+    instead of blocking the caller. Keys of recently queued objects are
+    remembered and uploading the same key again is skipped, which makes
+    content-addressed objects (e.g. crops keyed by their MD5) free to save
+    repeatedly. Objects larger than `part_size` are sent as multipart uploads.
+    """
+
+    def __init__(
+        self,
+        minio_client: Minio,
+        uploader_config: MinioUploaderConfig = MinioUploaderConfig(),
+        name: str = "minio",
+    ):
+        self.minio_client = minio_client
+        self.config = uploader_config
+        self.name = name
+        self.recent_keys = RecentKeys(uploader_config.recent_keys)
+        self._queue: queue.Queue = queue.Queue(maxsize=uploader_config.queue_size)
+        self._closed = False
+        self._threads = []
+        if uploader_config.enabled:
+            for i in range(uploader_config.workers):
+                thread = threading.Thread(
+                    target=self._run, name=f"{name}-uploader-{i}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+            atexit.register(self.close)
+        metrics.register_gauge(
+            f"{name}_queue_depth", lambda: {"total": self._queue.qsize()}
+        )
+
+    def upload(
+        self,
+        bucket_name: str,
+        object_name: str,
+        data: Union[bytes, BytesIO],
+        content_type: str = "application/octet-stream",
+    ) -> bool:
+        """
+        Queue an object upload, synchronous when the uploader is disabled.
+
+        :param data: Bytes or a file-like object with `getvalue`, like audio chunks.
+        :return: False when the object was recently written or the queue was
+            full and the upload dropped.
+        """
+        key = f"{bucket_name}/{object_name}"
+        if not self.recent_keys.add(key):
+            metrics.inc(f"{self.name}_skipped", bucket_name)
+            logging.debug(f"[MinIO] Skipping upload of recently written '{key}'")
+            return False
+
+        if hasattr(data, "getvalue"):
+            data = data.getvalue()
+        upload = MinioUpload(
+            bucket_name, object_name, data, content_type, time.monotonic()
+        )
+        if not self._threads or self._closed:
+            return self._put(upload)
+        try:
+            self._queue.put_nowait(upload)
+        except queue.Full:
+            self.recent_keys.discard(key)
+            metrics.inc(f"{self.name}_dropped", bucket_name)
+            logging.warning(f"[MinIO] Queue full, dropping upload of '{key}'")
+            return False
+        metrics.inc(f"{self.name}_queued", bucket_name)
+        return True
+
+    def _put(self, upload: MinioUpload) -> bool:
+        start = time.monotonic()
+        try:
+            self.minio_client.put_object(
+                upload.bucket_name,
+                upload.object_name,
+                BytesIO(upload.data),
+                len(upload.data),
+                content_type=upload.content_type,
+                part_size=self.config.part_size,
+            )
+        except Exception as e:
+            # Let a later upload of the same key retry
+            self.recent_keys.discard(f"{upload.bucket_name}/{upload.object_name}")
+            metrics.inc(f"{self.name}_failed", upload.bucket_name)
+            logging.error(f"[MinIO] Could not upload '{upload.object_name}': {e}")
+            return False
+        metrics.inc(f"{self.name}_uploaded", upload.bucket_name)
+        metrics.inc(f"{self.name}_uploaded_bytes", upload.bucket_name, len(upload.data))
+        metrics.set(
+            f"{self.name}_upload_latency_s",
+            upload.bucket_name,
+            time.monotonic() - start,
+        )
+        metrics.set(
+            f"{self.name}_queue_latency_s",
+            upload.bucket_name,
+            start - upload.queued_at,
+        )
+        return True
+
+    def _run(self):
+        while True:
+            upload = self._queue.get()
+            if upload is None:
+                return
+            self._put(upload)
+
+    def close(self):
+        """Upload queued objects and stop the background threads."""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
@@ -0,0 +1,153 @@
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from typing import Hashable, List, Optional
+
+from utils.config import SlackDispatcherConfig
+from utils.metrics import metrics
+
+SlackEvent = namedtuple("SlackEvent", ["kind", "key", "images", "message", "queued_at"])
+
+
+class SlackDispatcher:
+    """
+    Sends Slack notifications from a background thread.
+
+    Notifications are put on a bounded queue, when it is full new ones are
+    dropped instead of blocking the caller. Events with the same key arriving
+    within `coalesce_window_s` of the first one are merged into a single
+    message carrying all their images, e.g. ROI alerts of several regions of
+    a camera or a burst of analysis errors. Messages are sent at most once
+    per `min_interval_s`, rate limit responses of the Slack API and of the
+    webhook are retried after the requested delay.
+    """
+
+    def __init__(
+        self,
+        slack_client,
+        dispatcher_config: SlackDispatcherConfig = SlackDispatcherConfig(),
+        name: str = "slack",
+    ):
+        self.slack_client = slack_client
+        self.config = dispatcher_config
+        self.name = name
+        self._queue: queue.Queue = queue.Queue(maxsize=dispatcher_config.queue_size)
+        self._pending: "OrderedDict[tuple, list]" = OrderedDict()
+        self._last_sent_at = 0.0
+        self._thread = None
+        self._lock = threading.Lock()
+        metrics.register_gauge(
+            f"{name}_queue_depth", lambda: {"total": self._queue.qsize()}
+        )
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"{self.name}-dispatcher", daemon=True
+                )
+                self._thread.start()
+
+    def notify(
+        self, message: str, images: Optional[List] = None, key: Hashable = None
+    ) -> bool:
+        """
+        Queue a text message, with images when given.
+
+        :param key: Events with equal keys are coalesced, None never coalesces.
+        :return: False when the queue was full and the notification dropped.
+        """
+        self._ensure_started()
+        kind = "media" if images else "text"
+        event = SlackEvent(kind, key, list(images or []), message, time.monotonic())
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            metrics.inc(f"{self.name}_dropped", kind)
+            logging.warning(f"[SLACK] Queue full, dropping notification '{message}'")
+            return False
+        metrics.inc(f"{self.name}_queued", kind)
+        return True
+
+    def _due_at(self, group: List[SlackEvent]) -> float:
+        if group[0].key is None:
+            return group[0].queued_at
+        return group[0].queued_at + self.config.coalesce_window_s
+
+    def _add_pending(self, event: SlackEvent):
+        group_key = (event.kind, event.key if event.key is not None else object())
+        group = self._pending.get(group_key)
+        if group is None:
+            self._pending[group_key] = [event]
+        else:
+            group.append(event)
+            metrics.inc(f"{self.name}_coalesced", event.kind)
+
+    def _next_due(self) -> Optional[float]:
+        if not self._pending:
+            return None
+        return min(self._due_at(group) for group in self._pending.values())
+
+    def _run(self):
+        while True:
+            next_due = self._next_due()
+            timeout = None if next_due is None else max(0, next_due - time.monotonic())
+            try:
+                self._add_pending(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                pass
+
+            # Flush groups past their window in arrival order
+            now = time.monotonic()
+            for group_key, group in list(self._pending.items()):
+                if self._due_at(group) <= now:
+                    del self._pending[group_key]
+                    self._send_group(group)
+
+    def _wait_rate_limit(self):
+        wait_s = self._last_sent_at + self.config.min_interval_s - time.monotonic()
+        if wait_s > 0:
+            time.sleep(wait_s)
+        self._last_sent_at = time.monotonic()
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        """
+        Delay requested by a rate limited response (`SlackApiError` of the
+        Web API or `HTTPError` of the webhook), None for other errors.
+        """
+        response = getattr(error, "response", None)
+        if getattr(response, "status_code", None) != 429:
+            return None
+        return float(response.headers.get("Retry-After", 1))
+
+    def _send_group(self, group: List[SlackEvent]):
+        kind = group[0].kind
+        # Same message repeated by several events is sent once
+        message = "\n".join(dict.fromkeys(event.message for event in group))
+        images = [image for event in group for image in event.images]
+        images = images[: self.config.max_images]
+
+        for attempt in range(self.config.retries + 1):
+            self._wait_rate_limit()
+            try:
+                if kind == "media":
+                    self.slack_client.send_slack_media_text_message(images, message)
+                else:
+                    self.slack_client.send_slack_text_message(message)
+                break
+            except Exception as e:
+                retry_after = self._retry_after(e)
+                if retry_after is None or attempt == self.config.retries:
+                    metrics.inc(f"{self.name}_failed", kind)
+                    logging.error(f"[SLACK] Could not send notification: {e}")
+                    return
+                logging.warning(f"[SLACK] Rate limited, retrying in {retry_after}s")
+                time.sleep(retry_after)
+
+        metrics.inc(f"{self.name}_sent", kind)
+        metrics.set(
+            f"{self.name}_send_latency_s", kind, time.monotonic() - group[0].queued_at
+        )
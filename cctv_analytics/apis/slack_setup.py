@@ -1,4 +1,3 @@
-import requests
 import logging
 import slack_sdk
 from typing import List, Optional
@@ -6,27 +5,70 @@ from utils.config import SlackConfig
 from PIL import Image
 from io import BytesIO
 
+from apis.http_transport import backend_settings, transport_for
+from apis.slack_dispatcher import SlackDispatcher
+
 
 class SlackAPI:
     def __init__(self, slack_config: Optional[SlackConfig] = None):
         self.config = slack_config
         self.client = slack_sdk.WebClient(token=self.config.oauth_token)
+        self.dispatcher = None
+        if self.config.dispatcher.enabled:
+            # Rate limits are retried only by the dispatcher, after Retry-After
+            self.transport = transport_for(
+                "slack",
+                retry_statuses=[
+                    status
+                    for status in backend_settings("slack").retry_statuses
+                    if status != 429
+                ],
+            )
+            self.dispatcher = SlackDispatcher(self, self.config.dispatcher)
+        else:
+            self.transport = transport_for("slack")
+
+    def notify(self, message, images_list: Optional[List] = None, key=None):
+        """
+        Send message, with media when images are given, without blocking the
+        caller when the dispatcher is enabled.
+
+        :param key: Notifications with equal keys (e.g. the camera) are merged
+            into one message within the coalescing window.
+        """
+        if self.dispatcher is not None:
+            self.dispatcher.notify(message, images_list, key)
+            return
+        try:
+            if images_list:
+                self.send_slack_media_text_message(images_list, message)
+            else:
+                self.send_slack_text_message(message)
+        except Exception as e:
+            logging.error(f"[SLACK] Could not send notification: {e}")
 
-    def send_slack_media_text_message(self, images_list: List[Image.Image], message):
+    def send_slack_media_text_message(self, images_list: List, message):
+        """
+        :param images_list: PIL images or crop artifacts, artifacts are sent
+            with their already encoded JPEG bytes.
+        """
         logging.debug(
             f"[SLACK] Sending text with media files ({len(images_list)}) and message: '{message}'"
         )
         file_uploads = []
 
         for idx, image in enumerate(images_list):
-            # Create a BytesIO object
-            image_bytes = BytesIO()
+            if isinstance(image, Image.Image):
+                # Create a BytesIO object
+                image_bytes = BytesIO()
 
-            # Save the image to the BytesIO object in a specific format (e.g., JPEG)
-            image.save(image_bytes, format="JPEG")
+                # Save the image to the BytesIO object in a specific format (e.g., JPEG)
+                image.save(image_bytes, format="JPEG")
 
-            # Get the byte data from the BytesIO object
-            image_data = image_bytes.getvalue()
+                # Get the byte data from the BytesIO object
+                image_data = image_bytes.getvalue()
+            else:
+                image_data = image.jpeg_bytes
             file_uploads.append(
                 {"file": image_data, "filename": f"image_{idx}.jpeg", "title": message}
             )
@@ -38,17 +80,17 @@ class SlackAPI:
         )
 
     def send_slack_text_message(self, message):
+        """
+        :raises requests.RequestException: When the webhook could not be
+            reached or did not accept the message, `HTTPError` carries the
+            response for rate limit handling.
+        """
         logging.debug(f"[SLACK] Sending text with message: '{message}'")
-        try:
-            url = self.config.notify_url
-            response = requests.post(
-                url,
-                headers={"Content-type": "application/json"},
-                json={"text": message},
-            )
-            if response.ok:
-                logging.debug("Message sent successfully.")
-            else:
-                logging.error("Failed to send the message:", response.text)
-        except Exception as e:
-            logging.error("Could not send slack message" + e)
+        url = self.config.notify_url
+        response = self.transport.post(
+            url,
+            headers={"Content-type": "application/json"},
+            json={"text": message},
+        )
+        response.raise_for_status()
+        logging.debug("Message sent successfully.")
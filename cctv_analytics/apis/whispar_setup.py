@@ -1,14 +1,40 @@
-import requests
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
+from itertools import accumulate
+from typing import Optional
 from pydub import AudioSegment
-from pydub.silence import split_on_silence
 import logging
 
+from apis.http_transport import HttpTransport, transport_for
+from utils.audio_codec import ChunkCodec
+from utils.audio_vad import length_ms, segment_samples, split_samples
+
 
 class WhisparAPI:
-    def __init__(self, api_url, api_key) -> None:
+    def __init__(
+        self,
+        api_url,
+        api_key,
+        transport: Optional[HttpTransport] = None,
+        max_concurrency: int = 4,
+        codec: Optional[ChunkCodec] = None,
+    ) -> None:
+        """
+        :param max_concurrency: Maximum number of chunks transcribed at once,
+            also the limit of concurrent requests of the default transport so
+            that the `http` section doesn't cap it lower. A segment of n
+            chunks takes about n / max_concurrency round trips.
+        :param codec: Format of exported chunks, WAV when not given.
+        """
         self.api_url = api_url
         self.api_key = api_key
+        self.transport = transport or transport_for(
+            "whispar", max_concurrency=max_concurrency
+        )
+        self.codec = codec or ChunkCodec()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="whispar"
+        )
 
     def transcribe_audio_api(self, audio: BytesIO):
         url = f"{self.api_url}/audio/api/v1/transcriptions"
@@ -19,7 +45,7 @@ class WhisparAPI:
 
         files = {"file": audio, "model": "whisper-1"}
 
-        response = requests.post(url, headers=headers, files=files)
+        response = self.transport.post(url, headers=headers, files=files)
 
         if response.status_code == 200:
             return response.json()["text"]
@@ -37,37 +63,53 @@ class WhisparAPI:
         min_silence_len = 500  # Minimum length of silence in ms
         keep_silence = 100  # Keep some silence at the beginning and end of each chunk
 
-        # Split the audio based on silence
-        chunks = split_on_silence(
-            audio,
+        # Split the audio based on silence, chunks are views of its samples
+        chunks = split_samples(
+            segment_samples(audio),
+            audio.frame_rate,
             min_silence_len=min_silence_len,
             silence_thresh=silence_thresh,
             keep_silence=keep_silence,
         )
-        response = []
 
         # Minimum chunk length to consider as valid (in milliseconds)
         min_chunk_length = 700
 
-        # Process each chunk and save it
-        for i, chunk in enumerate(chunks):
-            # Filter out chunks that are too short
-            if len(chunk) < min_chunk_length:
-                continue
+        # Start time of each chunk from the beginning of the audio
+        chunk_lengths = [length_ms(chunk, audio.frame_rate) for chunk in chunks]
+        start_times = accumulate(chunk_lengths, initial=0)
 
-            # Calculate the start time of the current chunk from the beginning of the audio
-            start_time = sum(len(chunks[j]) for j in range(i))
+        # Export and transcribe valid chunks concurrently
+        futures = [
+            self._executor.submit(
+                self.transcribe_chunk, chunk, audio.frame_rate, start_time
+            )
+            for chunk, chunk_length, start_time in zip(
+                chunks, chunk_lengths, start_times
+            )
+            # Filter out chunks that are too short
+            if chunk_length >= min_chunk_length
+        ]
 
-            # Export each valid chunk as a separate audio file
-            exported_chunk = BytesIO()
-            chunk.export(exported_chunk, format="mp3")
-            res = self.transcribe_audio_api(exported_chunk)
-            if len(res) > 0:
-                response.append(
-                    {
-                        "delta": start_time,
-                        "chunk": exported_chunk,
-                        "text": res,
-                    }
-                )
+        # Results in the order of chunks
+        response = []
+        for future in futures:
+            res = future.result()
+            if res is not None:
+                response.append(res)
         return response
+
+    def transcribe_chunk(self, chunk, frame_rate: int, start_time: int):
+        """
+        :param chunk: PCM samples of shape (frames, channels).
+        """
+        # Export the chunk as a separate audio file
+        exported_chunk = self.codec.encode(chunk, frame_rate)
+        res = self.transcribe_audio_api(exported_chunk)
+        if not res:
+            return None
+        return {
+            "delta": start_time,
+            "chunk": exported_chunk,
+            "text": res,
+        }
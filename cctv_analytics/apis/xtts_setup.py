@@ -1,18 +1,21 @@
 from io import BytesIO
-import requests
+from typing import Optional
 import logging
 import json
 
+from apis.http_transport import HttpTransport, transport_for
+
 
 class XttsAPI:
-    def __init__(self, api_url) -> None:
+    def __init__(self, api_url, transport: Optional[HttpTransport] = None) -> None:
         self.api_url = api_url
+        self.transport = transport or transport_for("xtts")
 
     def generate_speaker_embeddings(self, audio: BytesIO):
         url = f"{self.api_url}/clone_speaker"
 
         files = {"wav_file": audio.getvalue()}
-        response = requests.post(url, files=files)
+        response = self.transport.post(url, files=files)
 
         if response.status_code == 200:
             return response.json()
@@ -1,14 +1,17 @@
 from PIL import Image
 from io import BytesIO
 import base64
+import hashlib
+import threading
 import logging
 import pathlib
 import logging
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel, Field
 from io import BytesIO
 
 from utils.config import genconf, Camera
+from utils.camera_routing import CameraRouter
 
 config = genconf()
 
@@ -27,6 +30,66 @@ def pillow_image_to_base64(image: Image.Image):
     return img_base64
 
 
+class CropArtifact:
+    """
+    Image crop shared by every consumer of a detection (MinIO, Deepface,
+    Florence, Slack).
+
+    Decoded pixels, JPEG bytes, base64 of the JPEG and its MD5 are computed
+    lazily and at most once, so a crop is encoded a single time however many
+    backends use it.
+    """
+
+    def __init__(self, image: Optional[Image.Image] = None, jpeg_bytes=None):
+        if image is None and jpeg_bytes is None:
+            raise ValueError("Either image or jpeg_bytes is required.")
+        self._image = image
+        self._jpeg_bytes = jpeg_bytes
+        self._base64 = None
+        self._md5 = None
+        self._lock = threading.Lock()
+
+    @property
+    def image(self) -> Image.Image:
+        with self._lock:
+            if self._image is None:
+                self._image = Image.open(BytesIO(self._jpeg_bytes))
+            return self._image
+
+    @property
+    def jpeg_bytes(self) -> bytes:
+        with self._lock:
+            if self._jpeg_bytes is None:
+                buffered = BytesIO()
+                self._image.save(buffered, format="JPEG")
+                self._jpeg_bytes = buffered.getvalue()
+            return self._jpeg_bytes
+
+    @property
+    def base64(self) -> str:
+        jpeg_bytes = self.jpeg_bytes
+        with self._lock:
+            if self._base64 is None:
+                self._base64 = base64.b64encode(jpeg_bytes).decode("utf-8")
+            return self._base64
+
+    @property
+    def md5(self) -> str:
+        jpeg_bytes = self.jpeg_bytes
+        with self._lock:
+            if self._md5 is None:
+                self._md5 = hashlib.md5(jpeg_bytes).hexdigest()
+            return self._md5
+
+
+def crop_facial_area(image: Image.Image, facial_area: dict) -> Image.Image:
+    """
+    Crop face found by deepface, `facial_area` holds x, y, w, h of the face.
+    """
+    x, y = facial_area["x"], facial_area["y"]
+    return image.crop((x, y, x + facial_area["w"], y + facial_area["h"]))
+
+
 def expand_pillow_cropped_image(
     image: Image.Image, crop_coordinates, expand_factor=0.15
 ) -> Image.Image:
@@ -83,7 +146,6 @@ def check_if_name_exists(list_of_dicts: List[CamerasImages], name_to_check):
 def grab_current_images() -> List[CamerasImages]:
     from kafka import KafkaConsumer
 
-    all_cameras_images: List[CamerasImages] = []
     # Create a Kafka consumer instance
     consumer = KafkaConsumer(
         config.kafka.topics.image,
@@ -94,33 +156,31 @@ def grab_current_images() -> List[CamerasImages]:
         auto_offset_reset="latest",
     )
 
+    router = CameraRouter(config.cameras, config.kafka.headers, name="kafka_api")
+
     # Start consuming messages from the topic
-    matched_all = False
+    cameras_images: Dict[str, CamerasImages] = {}
     consumer.subscribe(config.kafka.topics.image)
     logging.info("Starting polling for images using kafka")
     logging.info(
         "Scrapping image from cameras: "
         + ", ".join([cam.name for cam in config.cameras])
     )
-    while True and not matched_all:
+    while len(cameras_images) < len(router):
         records = consumer.poll(timeout_ms=3000)
         consumer.seek_to_end()
         for tp, records_batch in records.items():
             for message in records_batch:
-                for camera in config.cameras:
-                    if camera.name.encode() == message.headers[0][1]:
-                        ts_parsed = str(message.headers[1][1].decode()).split(".")[0]
-                        timestamp = int(ts_parsed)
-                        image_bytes = message.value
-
-                        # Open the image using PIL
-                        image_buffer = BytesIO(image_bytes)
-                        if check_if_name_exists(all_cameras_images, camera.name):
-                            logging.info(f"Getting new camera feed {camera.name}")
-                            camera_info = CamerasImages(
-                                image=Image.open(image_buffer), camera=camera
-                            )
-                            all_cameras_images.append(camera_info)
-                    if len(all_cameras_images) == len(config.cameras):
-                        matched_all = True
+                camera = router.route(message)
+                if camera is None or camera.name in cameras_images:
+                    continue
+                image_bytes = message.value
+
+                # Open the image using PIL
+                image_buffer = BytesIO(image_bytes)
+                logging.info(f"Getting new camera feed {camera.name}")
+                cameras_images[camera.name] = CamerasImages(
+                    image=Image.open(image_buffer), camera=camera
+                )
+    all_cameras_images = list(cameras_images.values())
     return all_cameras_images
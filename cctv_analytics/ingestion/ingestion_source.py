@@ -0,0 +1,24 @@
+import abc
+from collections import namedtuple
+from typing import Callable
+
+# Mirrors the fields of kafka ConsumerRecord used by the analytics modules
+IngestedMessage = namedtuple(
+    "IngestedMessage", ["topic", "partition", "offset", "timestamp", "headers", "value"]
+)
+
+
+class IngestionSource(abc.ABC):
+    """
+    Source of camera messages (images or audio) for the analytics modules.
+
+    `run` blocks and calls `dispatch(message, camera, on_done=callback)` for every
+    message routed to a configured camera. The dispatcher must call
+    `callback(message)` once the message has been analyzed.
+    """
+
+    name = "source"
+
+    @abc.abstractmethod
+    def run(self, dispatch: Callable):
+        pass
@@ -0,0 +1,67 @@
+import logging
+from typing import Callable, List
+
+from ingestion.ingestion_source import IngestionSource
+from utils.camera_routing import CameraRouter
+from utils.config import Camera, ConsumptionPolicyConfig, KafkaConfig
+from utils.consumption_policy import ConsumptionPolicy
+from utils.offset_commits import OffsetCommitManager
+
+
+class KafkaSource(IngestionSource):
+    """
+    Consumes camera messages from a Kafka topic.
+
+    Polled records are filtered by the consumption policy, handed to the
+    dispatcher and their offsets are committed once the dispatcher reports
+    them as analyzed.
+    """
+
+    def __init__(
+        self,
+        kafka_config: KafkaConfig,
+        cameras: List[Camera],
+        topic: str,
+        group_id: str,
+        policy: ConsumptionPolicyConfig,
+        name: str = "kafka",
+    ):
+        self.kafka_config = kafka_config
+        self.topic = topic
+        self.group_id = group_id
+        self.name = name
+        self.router = CameraRouter(cameras, kafka_config.headers, name=name)
+        self.policy = ConsumptionPolicy(policy, self.router, name=name)
+
+    def run(self, dispatch: Callable):
+        from kafka import KafkaConsumer
+
+        # Create a Kafka consumer instance
+        consumer = KafkaConsumer(
+            self.topic,
+            bootstrap_servers=self.kafka_config.api_url,
+            group_id=self.group_id,
+            max_poll_records=16,
+            enable_auto_commit=False,
+            auto_offset_reset="latest",
+        )
+
+        commits = OffsetCommitManager(
+            consumer,
+            interval_s=self.kafka_config.commits.interval_s,
+            max_messages=self.kafka_config.commits.max_messages,
+            name=self.name,
+        )
+
+        # Start consuming messages from the topic
+        consumer.subscribe(self.topic)
+        logging.info(f"[{self.name}] Starting polling for {self.topic} using kafka")
+        while True:
+            records = consumer.poll(timeout_ms=3000)
+            commits.polled(records)
+            selected = self.policy.select(consumer, records)
+            for message, camera in selected:
+                commits.track(message)
+            for message, camera in selected:
+                dispatch(message, camera, on_done=commits.done)
+            commits.maybe_commit()
@@ -0,0 +1,134 @@
+import json
+import logging
+import pathlib
+import time
+import zipfile
+from typing import Callable, List
+
+from ingestion.ingestion_source import IngestedMessage, IngestionSource
+from utils.camera_routing import CameraRouter
+from utils.config import Camera, KafkaHeadersConfig, ReplayConfig
+from utils.metrics import metrics
+
+MANIFEST_FILE = "manifest.jsonl"
+
+
+class ReplaySource(IngestionSource):
+    """
+    Replays recorded camera messages from a directory or a single zip archive.
+
+    The recording holds a `manifest.jsonl` file with one JSON object per message:
+
+        {"kind": "image", "file": "frames/000001.jpg",
+         "headers": {"camera": "Camera 1", "timestamp": "1723456789.120"}}
+
+    `kind` is `image` or `audio`, `file` is a path relative to the directory
+    or a member of the archive (JPEG for images, WAV for audio). Headers are
+    passed in the given order, like Kafka headers. Messages are replayed in
+    manifest order, paced by their timestamp header and `speed`. Messages
+    without a timestamp header are not paced, the replay time is added as
+    their timestamp header.
+    """
+
+    def __init__(
+        self,
+        replay_config: ReplayConfig,
+        cameras: List[Camera],
+        kind: str,
+        header_keys: KafkaHeadersConfig = KafkaHeadersConfig(),
+        name: str = "replay",
+    ):
+        self.replay_config = replay_config
+        self.kind = kind
+        self.header_keys = header_keys
+        self.name = name
+        self.router = CameraRouter(cameras, header_keys, name=name)
+        self.path = pathlib.Path(replay_config.path)
+
+    def _open_recording(self):
+        """
+        :return: Manifest lines and function reading a recorded file by name.
+        """
+        if self.path.is_dir():
+            manifest = pathlib.Path(self.path, MANIFEST_FILE).read_text()
+            return (
+                manifest.splitlines(),
+                lambda file: pathlib.Path(self.path, file).read_bytes(),
+            )
+
+        archive = zipfile.ZipFile(self.path)
+        manifest = archive.read(MANIFEST_FILE).decode()
+        return manifest.splitlines(), archive.read
+
+    def _pace(self, timestamp: float):
+        """
+        Sleep until the message is due according to the replay speed.
+        """
+        if self.replay_config.speed <= 0:
+            return
+        if self._first_timestamp is None:
+            self._first_timestamp = timestamp
+            self._started = time.monotonic()
+            return
+        due = self._started + (
+            (timestamp - self._first_timestamp) / self.replay_config.speed
+        )
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _done(self, message):
+        metrics.inc(f"{self.name}_replayed", self.router.route(message).name)
+
+    def run(self, dispatch: Callable):
+        manifest_lines, read_file = self._open_recording()
+        entries = [json.loads(line) for line in manifest_lines if line.strip()]
+        entries = [entry for entry in entries if entry.get("kind") == self.kind]
+        logging.info(
+            f"[{self.name}] Replaying {len(entries)} {self.kind} messages from {self.path}"
+        )
+        untimed = sum(
+            self.header_keys.timestamp not in entry.get("headers", {})
+            for entry in entries
+        )
+        if untimed:
+            logging.warning(
+                f"[{self.name}] {untimed} {self.kind} messages have no "
+                f"'{self.header_keys.timestamp}' header and are not paced"
+            )
+
+        while True:
+            self._first_timestamp = None
+            for offset, entry in enumerate(entries):
+                entry_headers = entry.get("headers", {})
+                headers = [
+                    (key, str(value).encode()) for key, value in entry_headers.items()
+                ]
+                timestamp = entry_headers.get(self.header_keys.timestamp)
+                paced = timestamp is not None
+                if paced:
+                    timestamp = float(timestamp)
+                else:
+                    # Analyzers read the timestamp from the headers
+                    timestamp = time.time()
+                    headers.append(
+                        (self.header_keys.timestamp, str(timestamp).encode())
+                    )
+                message = IngestedMessage(
+                    topic=self.kind,
+                    partition=0,
+                    offset=offset,
+                    timestamp=int(timestamp * 1000),
+                    headers=headers,
+                    value=read_file(entry["file"]),
+                )
+                camera = self.router.route(message)
+                if camera is None:
+                    continue
+                if paced:
+                    self._pace(timestamp)
+                dispatch(message, camera, on_done=self._done)
+
+            if not self.replay_config.loop:
+                break
+        logging.info(f"[{self.name}] Finished replaying {self.kind} messages")
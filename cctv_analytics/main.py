@@ -21,101 +21,109 @@ import asyncio
 from api.call_slack import slack_socket
 from api.call_http import http_server
 
-from analytics_modules.analyze_images import analyze_image
-from analytics_modules.analyze_audio import analyze_audio
+from analytics_modules.analyze_images import (
+    analyze_image,
+    milvus_collections as images_milvus_collections,
+)
+from analytics_modules.analyze_audio import (
+    analyze_audio,
+    milvus_collections as audio_milvus_collections,
+)
+from apis.clients import milvus_client, slack_client, whispar_client
+from apis.milvus_setup import bootstrap_collections
+from ingestion.ingestion_source import IngestionSource
+from ingestion.kafka_source import KafkaSource
+from ingestion.replay_source import ReplaySource
+from utils.worker_pool import CameraWorkerPool
 
 config = genconf()
 
 
-def scan_and_detect_images_using_kafka():
-    from kafka import KafkaConsumer
+def analyze_image_and_report(message, camera):
+    try:
+        analyze_image(message, camera)
+    except Exception as e:
+        logging.warning("Could not analyze image" + traceback.format_exc())
+        try:
+            slack_client().notify("Could not analyze image!", key="analyze_image")
+        except Exception as e:
+            logging.error("Cannot connect to slack")
+
+
+def analyze_audio_and_report(message, camera, on_done=None):
+    try:
+        analyze_audio(message, camera)
+    except Exception as e:
+        logging.warning("Could not analyze audio" + traceback.format_exc())
+        try:
+            slack_client().notify("Could not analyze audio!", key="analyze_audio")
+        except Exception as e:
+            logging.error("Cannot connect to slack")
+    if on_done is not None:
+        on_done(message)
+
+
+def ingestion_source(kind: str) -> IngestionSource:
+    if config.ingestion.source == "replay":
+        return ReplaySource(
+            config.ingestion.replay,
+            config.cameras,
+            kind,
+            config.kafka.headers,
+            name=f"replay_{kind}",
+        )
+    if kind == "image":
+        return KafkaSource(
+            config.kafka,
+            config.cameras,
+            config.kafka.topics.image,
+            "CCTV_ANALYTICS_IMAGES_CONSTANT",
+            config.kafka.consumption.image,
+            name="kafka_images",
+        )
+    return KafkaSource(
+        config.kafka,
+        config.cameras,
+        config.kafka.topics.audio,
+        "CCTV_ANALYTICS_AUDIO_CONSTANT",
+        config.kafka.consumption.audio,
+        name="kafka_audio",
+    )
 
-    # Create a Kafka consumer instance
-    consumer = KafkaConsumer(
-        config.kafka.topics.image,
-        bootstrap_servers=config.kafka.api_url,
-        group_id="CCTV_ANALYTICS_IMAGES_CONSTANT",
-        max_poll_records=16,
-        enable_auto_commit=True,
-        auto_offset_reset="latest",
+
+def scan_and_detect_images():
+    # Frames are analyzed in parallel per camera, submit blocks when camera queue is full
+    workers = CameraWorkerPool(
+        analyze_image_and_report,
+        max_workers=config.kafka.image_workers.max_workers,
+        queue_size=config.kafka.image_workers.queue_size,
+        name="image_workers",
     )
+    ingestion_source("image").run(workers.submit)
+    workers.shutdown()
 
-    # Start consuming messages from the topic
-    consumer.subscribe(config.kafka.topics.image)
-    logging.info("Starting polling for images using kafka")
-    while True:
-        records = consumer.poll(timeout_ms=3000)
-        consumer.seek_to_end()
-        for tp, records_batch in records.items():
-            for message in records_batch:
-                for camera in config.cameras:
-                    try:
-                        if camera.name.encode() == message.headers[0][1]:
-                            try:
-                                analyze_image(message, camera)
-                            except Exception as e:
-                                logging.warning(
-                                    "Could not analyze image" + traceback.print_exc()
-                                )
-                                try:
-                                    slack_client.send_slack_text_message(
-                                        "Could not analyze image!"
-                                    )
-                                except Exception as e:
-                                    logging.error("Cannot connect to slack")
-
-                            consumer.commit()
-                    except IndexError as e:
-                        logging.error("There is no selected headers!" + e)
-
-
-def scan_and_detect_audio_using_kafka():
-    from kafka import KafkaConsumer
-
-    # Create a Kafka consumer instance
-    consumer = KafkaConsumer(
-        config.kafka.topics.audio,
-        bootstrap_servers=config.kafka.api_url,
-        group_id="CCTV_ANALYTICS_AUDIO_CONSTANT",
-        max_poll_records=16,
-        enable_auto_commit=True,
-        auto_offset_reset="latest",
+
+def scan_and_detect_audio():
+    ingestion_source("audio").run(analyze_audio_and_report)
+
+
+def bootstrap_milvus():
+    # Collections of all analytics are created at once before first message
+    bootstrap_collections(
+        milvus_client(),
+        images_milvus_collections + audio_milvus_collections,
+        config.milvus,
     )
-    # Start consuming messages from the topic
-    consumer.subscribe(config.kafka.topics.audio)
-    logging.info("Starting polling for audio using kafka")
-
-    while True:
-        records = consumer.poll(timeout_ms=3000)
-        consumer.seek_to_end()
-        for tp, records_batch in records.items():
-            for message in records_batch:
-                for camera in config.cameras:
-                    try:
-                        if camera.name.encode() == message.headers[0][1]:
-                            try:
-                                analyze_audio(message, camera)
-                            except Exception as e:
-                                logging.warning(
-                                    "Could not analyze audio" + traceback.print_exc()
-                                )
-                                try:
-                                    slack_client.send_slack_text_message(
-                                        "Could not analyze audio!"
-                                    )
-                                except Exception as e:
-                                    logging.error("Cannot connect to slack")
-
-                            consumer.commit()
-                    except IndexError as e:
-                        logging.error("There is no selected headers!" + e)
 
 
 async def main():
+    bootstrap_milvus()
+    # Audio chunk encoder processes start before any message is consumed
+    whispar_client()
     logging.info("Starting scheduling")
     for func in [
-        scan_and_detect_images_using_kafka,
-        scan_and_detect_audio_using_kafka,
+        scan_and_detect_images,
+        scan_and_detect_audio,
         slack_socket().run,
         http_server().run,
     ]:
@@ -124,4 +132,6 @@ async def main():
         awaitable = loop.run_in_executor(None, func)
 
 
-asyncio.run(main())
+# Guarded, encoder processes are spawned and import this module
+if __name__ == "__main__":
+    asyncio.run(main())
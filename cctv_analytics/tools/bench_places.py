@@ -0,0 +1,118 @@
+import sys
+import time
+import logging
+
+import numpy as np
+
+from shapely.geometry import Polygon, box
+
+from analytics_modules.bbox_check_places import PlaceIndex, PlaceRaster, check_place
+from utils.config import Place, configure_logging
+
+configure_logging()
+
+
+def random_places(rng, count, width=1920, height=1080):
+    """Random convex-ish polygons spread over the frame."""
+    places = []
+    for index in range(count):
+        center = rng.uniform((0, 0), (width, height))
+        radius = rng.uniform(40, 250)
+        angles = np.sort(rng.uniform(0, 2 * np.pi, rng.integers(4, 12)))
+        points = center + radius * np.stack([np.cos(angles), np.sin(angles)], axis=1)
+        places.append(
+            Place(name=f"place_{index}", polygon=[tuple(p) for p in points.astype(int)])
+        )
+    return places
+
+
+def random_bboxes(rng, count, width=1920, height=1080):
+    x1 = rng.uniform(0, width - 50, count)
+    y1 = rng.uniform(0, height - 100, count)
+    x2 = x1 + rng.uniform(20, 200, count)
+    y2 = y1 + rng.uniform(50, 400, count)
+    return np.stack([x1, y1, x2, y2], axis=1)
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def raster_mismatches(places, bboxes, expected, raster_results, tolerance):
+    """
+    Differences of raster and polygon results.
+
+    :return: Number of differing places and number of those further than
+        `tolerance` pixels from the bbox.
+    """
+    polygons = {place.name: Polygon(place.polygon) for place in places}
+    differing = outside_tolerance = 0
+    for bbox, expected_names, raster_names in zip(bboxes, expected, raster_results):
+        for name in set(expected_names) ^ set(raster_names):
+            differing += 1
+            if polygons[name].distance(box(*bbox)) > tolerance:
+                outside_tolerance += 1
+    return differing, outside_tolerance
+
+
+def run():
+    """
+    Compare per bbox `check_place` against the precompiled `PlaceIndex` and
+    the rasterized `PlaceRaster`.
+
+    Usage: bench_places [places] [bboxes] [repeat] [downscale]
+    """
+    places_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    bboxes_count = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    downscale = int(sys.argv[4]) if len(sys.argv) > 4 else 4
+
+    rng = np.random.default_rng(0)
+    places = random_places(rng, places_count)
+    bboxes = random_bboxes(rng, bboxes_count)
+
+    baseline_s, expected = timed(
+        lambda: [check_place(bbox, places) for bbox in bboxes], repeat
+    )
+    build_s, place_index = timed(lambda: PlaceIndex(places), repeat)
+    single_s, single = timed(
+        lambda: [place_index.overlapping(bbox) for bbox in bboxes], repeat
+    )
+    many_s, many = timed(lambda: place_index.overlapping_many(bboxes), repeat)
+    raster_build_s, place_raster = timed(lambda: PlaceRaster(places, downscale), 1)
+    raster_s, raster = timed(lambda: place_raster.overlapping_many(bboxes), repeat)
+
+    if single != expected or many != expected:
+        logging.error("PlaceIndex results differ from check_place")
+        sys.exit(1)
+
+    # Raster cells cover `downscale` pixels, edges may differ by a cell diagonal
+    tolerance = downscale * np.sqrt(2)
+    differing, outside_tolerance = raster_mismatches(
+        places, bboxes, expected, raster, tolerance
+    )
+    if outside_tolerance:
+        logging.error(
+            f"PlaceRaster differs by more than {tolerance:.1f} px for {outside_tolerance} places"
+        )
+        sys.exit(1)
+
+    logging.info(f"{places_count} places, {bboxes_count} bboxes per frame")
+    logging.info(f"check_place per bbox:        {baseline_s * 1e3:8.3f} ms/frame")
+    logging.info(f"PlaceIndex build (once):     {build_s * 1e3:8.3f} ms")
+    logging.info(f"PlaceIndex.overlapping:      {single_s * 1e3:8.3f} ms/frame")
+    logging.info(f"PlaceIndex.overlapping_many: {many_s * 1e3:8.3f} ms/frame")
+    logging.info(f"Speedup (vectorized):        {baseline_s / many_s:8.1f}x")
+    logging.info(f"PlaceRaster build (once):    {raster_build_s * 1e3:8.3f} ms")
+    logging.info(f"PlaceRaster.overlapping_many:{raster_s * 1e3:8.3f} ms/frame")
+    logging.info(f"Speedup (raster):            {baseline_s / raster_s:8.1f}x")
+    logging.info(
+        f"PlaceRaster edge differences:{differing:8d} (all within {tolerance:.1f} px)"
+    )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,174 @@
+import sys
+import time
+import logging
+
+import numpy as np
+
+from pydub import AudioSegment
+from pydub import silence
+
+from utils.audio_vad import (
+    segment_samples,
+    split_on_silence,
+    split_ranges,
+    split_samples,
+)
+from utils.config import configure_logging
+
+configure_logging()
+
+# Parameters used by WhisparAPI.transcribe_whole_segment
+SILENCE_THRESH = -50
+MIN_SILENCE_LEN = 500
+KEEP_SILENCE = 100
+
+
+SAMPLE_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+
+def random_speech(rng, seconds, frame_rate=16000, channels=1, sample_width=2):
+    """
+    Bursts of noise with varying loudness separated by pauses of varying
+    length, over background noise close to the silence threshold.
+    """
+    frames = int(seconds * frame_rate)
+    dtype = SAMPLE_DTYPES[sample_width]
+    limits = np.iinfo(dtype)
+    threshold = 10 ** (SILENCE_THRESH / 20) * (limits.max + 1)
+    samples = rng.normal(0, threshold * rng.uniform(0.5, 1.5), (frames, channels))
+    position = int(rng.uniform(0, 1) * frame_rate)
+    while position < frames:
+        length = int(rng.uniform(0.1, 3) * frame_rate)
+        samples[position : position + length] += rng.normal(
+            0, rng.uniform(0.3, 300) * threshold, (min(length, frames - position), 1)
+        )
+        position += length + int(rng.uniform(0.05, 2) * frame_rate)
+    samples = np.clip(samples, limits.min, limits.max).astype(dtype)
+    return AudioSegment(
+        samples.tobytes(),
+        frame_rate=frame_rate,
+        sample_width=sample_width,
+        channels=channels,
+    )
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def views_match(audio, views, expected) -> bool:
+    """
+    Sample views equal pydub chunks, except the silent frames pydub pads at
+    most 2 ms of the tail with.
+    """
+    if len(views) != len(expected):
+        return False
+    max_padding = int(audio.frame_rate * 2 / 1000) * audio.frame_width
+    for view, chunk in zip(views, expected):
+        data, expected_data = view.tobytes(), chunk.raw_data
+        padding = expected_data[len(data) :]
+        if (
+            not expected_data.startswith(data)
+            or len(padding) > max_padding
+            or padding.strip(b"\0")
+        ):
+            return False
+    return True
+
+
+def check_equivalence(rng, clips, seconds) -> int:
+    """:return: Number of clips split differently than by pydub."""
+    mismatches = 0
+    for index in range(clips):
+        audio = random_speech(
+            rng,
+            rng.uniform(0.2, seconds),
+            frame_rate=int(rng.choice([8000, 11025, 16000, 44100])),
+            channels=int(rng.choice([1, 2])),
+            sample_width=int(rng.choice([1, 2, 2, 4])),
+        )
+        min_silence_len = int(rng.choice([50, 250, MIN_SILENCE_LEN, 1000]))
+        keep_silence = [0, KEEP_SILENCE, 400, True][rng.integers(4)]
+        seek_step = int(rng.choice([1, 1, 7]))
+        expected = silence.split_on_silence(
+            audio, min_silence_len, SILENCE_THRESH, keep_silence, seek_step
+        )
+        chunks = split_on_silence(
+            audio, min_silence_len, SILENCE_THRESH, keep_silence, seek_step
+        )
+        views = split_samples(
+            segment_samples(audio),
+            audio.frame_rate,
+            min_silence_len,
+            SILENCE_THRESH,
+            keep_silence,
+            seek_step,
+        )
+        if [chunk.raw_data for chunk in chunks] != [
+            chunk.raw_data for chunk in expected
+        ] or not views_match(audio, views, expected):
+            mismatches += 1
+            logging.error(
+                f"Clip {index} ({len(audio)} ms, {audio.frame_rate} Hz, "
+                f"{audio.channels} ch, {audio.sample_width * 8} bit, min_silence_len={min_silence_len}, "
+                f"keep_silence={keep_silence}, seek_step={seek_step}) split differently"
+            )
+    return mismatches
+
+
+def run():
+    """
+    Check that the NumPy VAD splits random clips exactly like
+    `pydub.silence.split_on_silence`, zero-copy `split_samples` up to the
+    padded tail, and compare their speed.
+
+    Usage: bench_vad [clips] [seconds] [repeat]
+    """
+    clips = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 60
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+
+    rng = np.random.default_rng(0)
+    mismatches = check_equivalence(rng, clips, min(seconds, 10))
+    if mismatches:
+        logging.error(f"{mismatches} of {clips} clips differ from pydub")
+        sys.exit(1)
+
+    audio = random_speech(rng, seconds)
+    pydub_s, expected = timed(
+        lambda: silence.split_on_silence(
+            audio, MIN_SILENCE_LEN, SILENCE_THRESH, KEEP_SILENCE
+        ),
+        1,
+    )
+    numpy_s, chunks = timed(
+        lambda: split_on_silence(audio, MIN_SILENCE_LEN, SILENCE_THRESH, KEEP_SILENCE),
+        repeat,
+    )
+    ranges_s, _ = timed(
+        lambda: split_ranges(
+            np.frombuffer(audio.raw_data, np.int16).reshape(-1, 1),
+            audio.frame_rate,
+            MIN_SILENCE_LEN,
+            SILENCE_THRESH,
+            KEEP_SILENCE,
+        ),
+        repeat,
+    )
+    if [chunk.raw_data for chunk in chunks] != [chunk.raw_data for chunk in expected]:
+        logging.error("Benchmark clip split differently than by pydub")
+        sys.exit(1)
+
+    logging.info(f"{clips} random clips split like pydub")
+    logging.info(f"{seconds:.0f} s clip at 16 kHz, {len(chunks)} chunks")
+    logging.info(f"pydub split_on_silence:  {pydub_s * 1e3:10.1f} ms")
+    logging.info(f"NumPy split_on_silence:  {numpy_s * 1e3:10.1f} ms")
+    logging.info(f"NumPy split_ranges:      {ranges_s * 1e3:10.1f} ms")
+    logging.info(f"Speedup:                 {pydub_s / numpy_s:10.1f}x")
+
+
+if __name__ == "__main__":
+    run()
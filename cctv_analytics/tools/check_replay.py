@@ -0,0 +1,93 @@
+import sys
+import json
+import logging
+import pathlib
+import tempfile
+
+from ingestion.replay_source import MANIFEST_FILE, ReplaySource
+from utils.camera_routing import message_camera_name, message_timestamp
+from utils.config import Camera, ReplayConfig, configure_logging, genconf
+
+configure_logging()
+config = genconf()
+
+
+def sample_recording(directory: pathlib.Path, camera_name: str, header_keys):
+    """Recording of a timed and an untimed image and audio message."""
+    pathlib.Path(directory, "frame.jpg").write_bytes(b"")
+    pathlib.Path(directory, "clip.wav").write_bytes(b"")
+    entries = []
+    for kind, file in (("image", "frame.jpg"), ("audio", "clip.wav")):
+        entries.append(
+            {
+                "kind": kind,
+                "file": file,
+                "headers": {
+                    header_keys.camera: camera_name,
+                    header_keys.timestamp: "1723456789.120",
+                },
+            }
+        )
+        entries.append(
+            {"kind": kind, "file": file, "headers": {header_keys.camera: camera_name}}
+        )
+    pathlib.Path(directory, MANIFEST_FILE).write_text(
+        "\n".join(json.dumps(entry) for entry in entries)
+    )
+
+
+def check_recording(path: str, cameras) -> int:
+    """
+    Replay the recording as fast as possible and read the camera and
+    timestamp of every message like the analyzers do.
+
+    :return: Number of messages the analyzers could not read.
+    """
+    failures = 0
+    replay_config = ReplayConfig(path=path, speed=0)
+    header_keys = config.kafka.headers
+    for kind in ("image", "audio"):
+        replayed = []
+
+        def dispatch(message, camera, on_done):
+            replayed.append(message)
+            on_done(message)
+
+        ReplaySource(replay_config, cameras, kind, header_keys).run(dispatch)
+        for message in replayed:
+            try:
+                message_camera_name(message, header_keys)
+                message_timestamp(message, header_keys)
+            except Exception as e:
+                failures += 1
+                logging.error(
+                    f"{kind} message {message.offset} has unreadable headers "
+                    f"{message.headers}: {e!r}"
+                )
+        logging.info(f"{len(replayed)} {kind} messages replayed")
+    return failures
+
+
+def run():
+    """
+    Check that every message of a recording reaches the analyzers with a
+    camera and timestamp they can read. Without a path, a sample recording
+    with timed and untimed messages is checked.
+
+    Usage: check_replay [path]
+    """
+    if len(sys.argv) > 1:
+        failures = check_recording(sys.argv[1], config.cameras)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            camera = Camera(name="Replay check")
+            sample_recording(pathlib.Path(directory), camera.name, config.kafka.headers)
+            failures = check_recording(directory, [camera])
+    if failures:
+        logging.error(f"{failures} messages can't be analyzed")
+        sys.exit(1)
+    logging.info("All messages can be analyzed")
+
+
+if __name__ == "__main__":
+    run()
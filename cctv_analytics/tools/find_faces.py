@@ -1,14 +1,77 @@
+import ast
 import sys
 import json
 import logging
+from io import BytesIO
+from typing import Optional
+from minio import Minio
+from minio.error import S3Error
+from PIL import Image
 from pymilvus import MilvusClient, DataType
 from apis.deepface_setup import DeepfaceAPI, encode_image
+from common import CropArtifact, crop_facial_area
 from utils.config import genconf, configure_logging
 
 configure_logging()
 config = genconf()
 
 
+def face_characteristics_on_demand(deepface_conn, minio_client, entity):
+    """
+    Compute characteristics of a face saved in `lazy` deepface scan mode from
+    the person crop stored in MinIO.
+    """
+    person_image_bytes = minio_client.get_object(
+        config.minio.bucket_name, entity["image_object"]
+    ).read()
+    facial_area = ast.literal_eval(entity["image_facial_area"])
+    face = crop_facial_area(Image.open(BytesIO(person_image_bytes)), facial_area)
+    characteristics = deepface_conn.analyze_faces(
+        [CropArtifact(face).base64], actions=config.deepface.actions
+    )
+    return deepface_conn.combine_results(
+        [{"embedding": None, "facial_area": facial_area}], characteristics
+    )[0].get("characteristics", {})
+
+
+def face_characteristics_object(face_index) -> str:
+    """
+    MinIO object of the characteristics computed on demand, keyed by the
+    `index` of the face in 'master_faces'. The Milvus row isn't updated, an
+    upsert into the auto_id collection would store the face under a new index.
+    """
+    return f"face_characteristics/{face_index}.json"
+
+
+def load_face_characteristics(minio_client, face_index) -> Optional[dict]:
+    """:return: Characteristics computed by an earlier search, None if there are none."""
+    try:
+        response = minio_client.get_object(
+            config.minio.bucket_name, face_characteristics_object(face_index)
+        )
+    except S3Error as e:
+        if e.code == "NoSuchKey":
+            return None
+        raise
+    try:
+        return json.loads(response.read())
+    finally:
+        response.close()
+        response.release_conn()
+
+
+def save_face_characteristics(minio_client, face_index, characteristics):
+    """Store characteristics so later searches don't analyze the face again."""
+    data = json.dumps(characteristics).encode()
+    minio_client.put_object(
+        config.minio.bucket_name,
+        face_characteristics_object(face_index),
+        BytesIO(data),
+        len(data),
+        content_type="application/json",
+    )
+
+
 def run():
     # Check if an argument is provided
     if len(sys.argv) > 1:
@@ -18,6 +81,12 @@ def run():
 
     deepface_conn = DeepfaceAPI(config.deepface.url)
     client_milvus = MilvusClient(uri=config.milvus.uri, token=config.milvus.token)
+    minio_client = Minio(
+        config.minio.host,
+        access_key=config.minio.access_key,
+        secret_key=config.minio.secret_key,
+        secure=False,
+    )
 
     img = encode_image(image_path)
     embeddings = deepface_conn.represent(
@@ -35,8 +104,38 @@ def run():
             data=[embedding["embedding"]],
             limit=15,  # Max. number of search results to return
             search_params={"metric_type": "IP", "params": {}},  # Search parameters
+            output_fields=[
+                "image_id",
+                "image_tags",
+                "image_facial_area",
+                "image_object",
+                "attributes_pending",
+            ],
         )
 
+        # Faces saved in lazy scan mode are analyzed only when they are found,
+        # once, their characteristics are kept in MinIO
+        for hits in res:
+            for hit in hits:
+                entity = hit["entity"]
+                if entity.get("attributes_pending") and entity.get("image_object"):
+                    try:
+                        characteristics = load_face_characteristics(
+                            minio_client, hit["id"]
+                        )
+                        if characteristics is None:
+                            characteristics = face_characteristics_on_demand(
+                                deepface_conn, minio_client, entity
+                            )
+                            # Faces failing analysis are analyzed by a later search
+                            if characteristics:
+                                save_face_characteristics(
+                                    minio_client, hit["id"], characteristics
+                                )
+                        entity["image_tags"] = characteristics
+                    except Exception as e:
+                        logging.warning(f"Could not analyze face on demand: {e}")
+
         # Convert the output to a formatted JSON string
         result = json.dumps(res, indent=4)
         logging.info(result)
@@ -0,0 +1,97 @@
+import sys
+import time
+import logging
+import threading
+
+from analytics_modules.persons.persons_roi import ROITimeoutScheduler, TimeoutScheduler
+from utils.config import configure_logging
+
+configure_logging()
+
+
+def run():
+    """
+    Keep many regions occupied by restarting their timeouts from several
+    threads, then let all of them expire. Every region must get exactly one
+    start and one end callback.
+
+    Usage: stress_roi_timeouts [regions] [seconds] [timeout_s]
+    """
+    regions_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    duration_s = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    timeout_s = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+
+    lock = threading.Lock()
+    starts = [0] * regions_count
+    ends = [0] * regions_count
+    end_times = [0.0] * regions_count
+
+    def on_start(index):
+        with lock:
+            starts[index] += 1
+
+    def on_end(index):
+        with lock:
+            ends[index] += 1
+            end_times[index] = time.monotonic()
+
+    scheduler = TimeoutScheduler(name="roi_timeouts_stress")
+    regions = [
+        ROITimeoutScheduler(
+            f"region_{index}",
+            timeout_s,
+            lambda index=index: on_start(index),
+            lambda index=index: on_end(index),
+            scheduler=scheduler,
+        )
+        for index in range(regions_count)
+    ]
+
+    restarts = [0]
+    threads_before = threading.active_count()
+    stop_at = time.monotonic() + duration_s
+
+    def camera_loop(offset, step):
+        count = 0
+        while time.monotonic() < stop_at:
+            for region in regions[offset::step]:
+                region.start()
+                count += 1
+        with lock:
+            restarts[0] += count
+
+    workers = [
+        threading.Thread(target=camera_loop, args=(offset, 4)) for offset in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    peak_threads = threads_before
+    while any(worker.is_alive() for worker in workers):
+        peak_threads = max(peak_threads, threading.active_count())
+        time.sleep(0.05)
+    last_restart = time.monotonic()
+
+    # Wait for all timeouts to expire
+    deadline = last_restart + timeout_s + 5
+    while sum(ends) < regions_count and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    late_s = max(end_times) - last_restart - timeout_s
+    logging.info(f"{regions_count} regions, {restarts[0]} restarts in {duration_s}s")
+    logging.info(f"Restarts per second:   {restarts[0] / duration_s:12.0f}")
+    logging.info(f"Peak threads:          {peak_threads:12d}")
+    logging.info(f"Last end after expiry: {late_s * 1e3:12.1f} ms")
+
+    if any(count != 1 for count in starts) or any(count != 1 for count in ends):
+        logging.error(
+            f"Expected one start and end per region, got starts {min(starts)}-{max(starts)}, "
+            f"ends {min(ends)}-{max(ends)}"
+        )
+        sys.exit(1)
+    if len(scheduler):
+        logging.error(f"{len(scheduler)} timeouts still scheduled")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run()
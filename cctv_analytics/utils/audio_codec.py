@@ -0,0 +1,175 @@
+import io
+import atexit
+import struct
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+from pydub import AudioSegment
+
+# Content types of the chunk formats
+CHUNK_FORMATS = {"wav": "audio/wav", "mp3": "audio/mpeg", "opus": "audio/ogg"}
+
+
+def wav_header(data_size: int, frame_rate: int, sample_width: int, channels: int):
+    """Canonical 44 byte header of a PCM WAV file with `data_size` bytes of samples."""
+    block_align = sample_width * channels
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",
+        36 + data_size,
+        b"WAVE",
+        b"fmt ",
+        16,
+        1,
+        channels,
+        frame_rate,
+        frame_rate * block_align,
+        block_align,
+        sample_width * 8,
+        b"data",
+        data_size,
+    )
+
+
+class WavChunk(io.RawIOBase):
+    """
+    Read-only WAV file of PCM samples.
+
+    Only the header is allocated, reads take the samples straight from the
+    source buffer, which must stay unchanged while the chunk is in use.
+    """
+
+    extension = "wav"
+    content_type = CHUNK_FORMATS["wav"]
+
+    def __init__(self, samples: np.ndarray, frame_rate: int):
+        """
+        :param samples: Contiguous PCM samples of shape (frames, channels).
+        """
+        super().__init__()
+        self._pcm = memoryview(samples).cast("B")
+        self._header = wav_header(
+            len(self._pcm), frame_rate, samples.dtype.itemsize, samples.shape[1]
+        )
+        self._position = 0
+        # Lets multipart uploads guess the file type
+        self.name = f"chunk.{self.extension}"
+
+    def __len__(self):
+        return len(self._header) + len(self._pcm)
+
+    def _slice(self, start: int, end: int) -> bytes:
+        header_size = len(self._header)
+        return b"".join(
+            (
+                self._header[start:end],
+                self._pcm[max(start - header_size, 0) : max(end - header_size, 0)],
+            )
+        )
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self)
+        self._position = max(offset, 0)
+        return self._position
+
+    def read(self, size=-1) -> bytes:
+        end = len(self)
+        if size is not None and size >= 0:
+            end = min(end, self._position + size)
+        data = self._slice(self._position, end)
+        self._position += len(data)
+        return data
+
+    readall = read
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def getvalue(self) -> bytes:
+        """Whole file, like `BytesIO.getvalue`."""
+        return self._slice(0, len(self))
+
+
+class EncodedChunk(io.BytesIO):
+    """Compressed audio file with the name and content type of its format."""
+
+    def __init__(self, data: bytes, chunk_format: str):
+        super().__init__(data)
+        self.extension = chunk_format
+        self.content_type = CHUNK_FORMATS[chunk_format]
+        self.name = f"chunk.{chunk_format}"
+
+
+def encode_pcm(
+    pcm: bytes, frame_rate: int, sample_width: int, channels: int, chunk_format: str
+) -> bytes:
+    """Encode PCM samples with ffmpeg, run in the encoder processes."""
+    segment = AudioSegment(
+        pcm, frame_rate=frame_rate, sample_width=sample_width, channels=channels
+    )
+    encoded = io.BytesIO()
+    segment.export(encoded, format=chunk_format)
+    return encoded.getvalue()
+
+
+class ChunkCodec:
+    """
+    Turns chunks of PCM samples into audio files for Whisper, XTTS and MinIO.
+
+    'wav' writes a header in front of the samples without copying them.
+    'mp3' and 'opus' are encoded by ffmpeg through pydub in a pool of
+    `processes` worker processes, created with the codec and shut down at
+    exit. Workers are spawned rather than forked, forking the threaded
+    analytics process could copy locks held by other threads.
+    """
+
+    def __init__(self, chunk_format: str = "wav", processes: int = 2):
+        if chunk_format not in CHUNK_FORMATS:
+            raise ValueError(f"Unsupported chunk format '{chunk_format}'")
+        self.chunk_format = chunk_format
+        self.processes = processes
+        self._executor: Optional[ProcessPoolExecutor] = None
+        if chunk_format != "wav":
+            self._executor = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            atexit.register(self.close)
+
+    def close(self):
+        """Stop the encoder processes."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def encode(self, samples: np.ndarray, frame_rate: int):
+        """
+        :param samples: Contiguous PCM samples of shape (frames, channels).
+        :return: File-like chunk with `getvalue`, `extension` and `content_type`.
+        """
+        if self.chunk_format == "wav":
+            return WavChunk(samples, frame_rate)
+        data = self._executor.submit(
+            encode_pcm,
+            samples.tobytes(),
+            frame_rate,
+            samples.dtype.itemsize,
+            samples.shape[1],
+            self.chunk_format,
+        ).result()
+        return EncodedChunk(data, self.chunk_format)
@@ -0,0 +1,242 @@
+from typing import List, Optional, Union
+
+import numpy as np
+
+# Signed PCM samples as read by audioop, which pydub uses to measure RMS
+SAMPLE_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+
+def segment_samples(audio_segment) -> np.ndarray:
+    """PCM samples of a pydub AudioSegment as a (frames, channels) array view."""
+    if audio_segment.sample_width not in SAMPLE_DTYPES:
+        raise ValueError(f"Unsupported sample width {audio_segment.sample_width}")
+    return np.frombuffer(
+        audio_segment.raw_data, dtype=SAMPLE_DTYPES[audio_segment.sample_width]
+    ).reshape(-1, audio_segment.channels)
+
+
+def length_ms(samples: np.ndarray, frame_rate: int) -> int:
+    """Length in milliseconds, rounded like `len(AudioSegment)`."""
+    return round(1000 * (len(samples) / frame_rate))
+
+
+def max_possible_amplitude(samples: np.ndarray) -> float:
+    return 2 ** (samples.dtype.itemsize * 8) / 2
+
+
+def window_rms(
+    samples: np.ndarray, frame_rate: int, starts_ms: np.ndarray, window_ms: int
+) -> np.ndarray:
+    """
+    RMS of the `window_ms` long windows starting at `starts_ms`.
+
+    Equal to `audio_segment[start:start + window_ms].rms` for every start:
+    windows are cut at the same frames, frames past the end count as silence
+    and the RMS is truncated to an integer. Window energies are differences
+    of one cumulative sum, so all windows cost a single pass over the samples.
+    """
+    frames, channels = samples.shape
+    seg_len = length_ms(samples, frame_rate)
+
+    def to_frame(ms):
+        return (np.minimum(ms, seg_len) * (frame_rate / 1000.0)).astype(np.int64)
+
+    start, end = to_frame(starts_ms), to_frame(starts_ms + window_ms)
+
+    # Exact for 8 and 16 bit samples. 32 bit squares would overflow int64 and
+    # are summed as floats, like audioop does, so windows within a rounding
+    # error of the threshold may be classified differently
+    dtype = np.int64 if samples.dtype.itemsize <= 2 else np.float64
+    energy = np.zeros(frames + 1, dtype=dtype)
+    np.cumsum(np.square(samples, dtype=dtype).sum(axis=1, dtype=dtype), out=energy[1:])
+
+    sums = energy[np.minimum(end, frames)] - energy[np.minimum(start, frames)]
+    counts = (end - start) * channels
+    rms = np.zeros(len(start))
+    nonempty = counts > 0
+    rms[nonempty] = np.floor(np.sqrt(sums[nonempty] / counts[nonempty]))
+    return rms
+
+
+def frame_dbfs(
+    samples: np.ndarray, frame_rate: int, window_ms: int, step_ms: Optional[int] = None
+) -> np.ndarray:
+    """Loudness in dBFS of consecutive windows, -inf for digital silence."""
+    starts_ms = np.arange(
+        0, length_ms(samples, frame_rate) - window_ms + 1, step_ms or window_ms
+    )
+    rms = window_rms(samples, frame_rate, starts_ms, window_ms)
+    with np.errstate(divide="ignore"):
+        return 20 * np.log10(rms / max_possible_amplitude(samples))
+
+
+def detect_silence(
+    samples: np.ndarray,
+    frame_rate: int,
+    min_silence_len: int = 1000,
+    silence_thresh: float = -16,
+    seek_step: int = 1,
+) -> List[List[int]]:
+    """
+    Silent sections [start, end] in milliseconds, same as
+    `pydub.silence.detect_silence` of the audio segment of `samples`.
+
+    :param samples: PCM samples of shape (frames, channels).
+    """
+    seg_len = length_ms(samples, frame_rate)
+
+    # A silent portion can't be longer than the sound
+    if seg_len < min_silence_len:
+        return []
+
+    # Compare RMS of windows with the threshold instead of dBFS to every window
+    silence_thresh = 10 ** (silence_thresh / 20) * max_possible_amplitude(samples)
+
+    last_slice_start = seg_len - min_silence_len
+    slice_starts = np.arange(0, last_slice_start + 1, seek_step)
+    # The last portion of the audio is always searched
+    if last_slice_start % seek_step:
+        slice_starts = np.append(slice_starts, last_slice_start)
+
+    rms = window_rms(samples, frame_rate, slice_starts, min_silence_len)
+    silence_starts = slice_starts[rms <= silence_thresh]
+    if not len(silence_starts):
+        return []
+
+    # Silent windows that are neither continuous nor overlapping start a new range
+    prev_starts, next_starts = silence_starts[:-1], silence_starts[1:]
+    breaks = (next_starts != prev_starts + seek_step) & (
+        next_starts > prev_starts + min_silence_len
+    )
+    range_starts = np.concatenate(([silence_starts[0]], next_starts[breaks]))
+    range_ends = np.concatenate((prev_starts[breaks], [silence_starts[-1]]))
+    return [
+        [int(start), int(end) + min_silence_len]
+        for start, end in zip(range_starts, range_ends)
+    ]
+
+
+def detect_nonsilent(
+    samples: np.ndarray,
+    frame_rate: int,
+    min_silence_len: int = 1000,
+    silence_thresh: float = -16,
+    seek_step: int = 1,
+) -> List[List[int]]:
+    """Inverse of `detect_silence`, same as `pydub.silence.detect_nonsilent`."""
+    silent_ranges = detect_silence(
+        samples, frame_rate, min_silence_len, silence_thresh, seek_step
+    )
+    seg_len = length_ms(samples, frame_rate)
+
+    # Whole audio is nonsilent
+    if not silent_ranges:
+        return [[0, seg_len]]
+
+    # Whole audio is silent
+    if silent_ranges[0][0] == 0 and silent_ranges[0][1] == seg_len:
+        return []
+
+    prev_end = 0
+    nonsilent_ranges = []
+    for start, end in silent_ranges:
+        nonsilent_ranges.append([prev_end, start])
+        prev_end = end
+
+    if end != seg_len:
+        nonsilent_ranges.append([prev_end, seg_len])
+
+    if nonsilent_ranges[0] == [0, 0]:
+        nonsilent_ranges.pop(0)
+
+    return nonsilent_ranges
+
+
+def split_ranges(
+    samples: np.ndarray,
+    frame_rate: int,
+    min_silence_len: int = 1000,
+    silence_thresh: float = -16,
+    keep_silence: Union[int, bool] = 100,
+    seek_step: int = 1,
+) -> List[List[int]]:
+    """
+    Sections [start, end] in milliseconds of the chunks
+    `pydub.silence.split_on_silence` splits the audio into.
+
+    :param keep_silence: Silence in ms kept around chunks, split evenly between
+        neighbouring chunks when they would overlap. True keeps all of it.
+    """
+    seg_len = length_ms(samples, frame_rate)
+    if isinstance(keep_silence, bool):
+        keep_silence = seg_len if keep_silence else 0
+
+    output_ranges = [
+        [start - keep_silence, end + keep_silence]
+        for start, end in detect_nonsilent(
+            samples, frame_rate, min_silence_len, silence_thresh, seek_step
+        )
+    ]
+
+    for range_i, range_ii in zip(output_ranges, output_ranges[1:]):
+        if range_ii[0] < range_i[1]:
+            range_i[1] = (range_i[1] + range_ii[0]) // 2
+            range_ii[0] = range_i[1]
+
+    return [[max(start, 0), min(end, seg_len)] for start, end in output_ranges]
+
+
+def split_on_silence(
+    audio_segment,
+    min_silence_len: int = 1000,
+    silence_thresh: float = -16,
+    keep_silence: Union[int, bool] = 100,
+    seek_step: int = 1,
+) -> list:
+    """Drop-in replacement of `pydub.silence.split_on_silence`."""
+    return [
+        audio_segment[start:end]
+        for start, end in split_ranges(
+            segment_samples(audio_segment),
+            audio_segment.frame_rate,
+            min_silence_len,
+            silence_thresh,
+            keep_silence,
+            seek_step,
+        )
+    ]
+
+
+def split_samples(
+    samples: np.ndarray,
+    frame_rate: int,
+    min_silence_len: int = 1000,
+    silence_thresh: float = -16,
+    keep_silence: Union[int, bool] = 100,
+    seek_step: int = 1,
+) -> List[np.ndarray]:
+    """
+    Chunks of `split_ranges` as views of `samples`, cut at the same frames as
+    pydub slices but without copying.
+
+    pydub pads a slice ending past the last frame with up to 2 ms of silence,
+    which happens at the tail when `len()` was rounded up. A view can't be
+    padded, so the last chunk may lack those silent frames and its
+    `length_ms` may be 1 ms shorter.
+    """
+    frames = len(samples)
+
+    def to_frame(ms):
+        return min(int(ms * (frame_rate / 1000.0)), frames)
+
+    return [
+        samples[to_frame(start) : to_frame(end)]
+        for start, end in split_ranges(
+            samples,
+            frame_rate,
+            min_silence_len,
+            silence_thresh,
+            keep_silence,
+            seek_step,
+        )
+    ]
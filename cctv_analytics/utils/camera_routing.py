@@ -0,0 +1,81 @@
+import logging
+from typing import Dict, List, Optional
+
+from utils.config import Camera, KafkaHeadersConfig
+from utils.metrics import metrics
+
+
+def message_headers(message) -> Dict[str, bytes]:
+    """
+    Kafka headers of the message as a dictionary keyed by header key.
+    """
+    return {key: value for key, value in (message.headers or [])}
+
+
+def _header_value(message, key: str, position: int) -> bytes:
+    """
+    Header value by key, falls back to the header position for producers which
+    do not name their headers.
+    """
+    headers = message_headers(message)
+    if key in headers:
+        return headers[key]
+    return message.headers[position][1]
+
+
+def message_camera_name(
+    message, header_keys: KafkaHeadersConfig = KafkaHeadersConfig()
+) -> bytes:
+    return _header_value(message, header_keys.camera, 0)
+
+
+def message_timestamp(
+    message, header_keys: KafkaHeadersConfig = KafkaHeadersConfig()
+) -> int:
+    """
+    Unix timestamp (seconds) of the message, fractional part is dropped.
+    """
+    ts_raw = _header_value(message, header_keys.timestamp, 1)
+    return int(str(ts_raw.decode()).split(".")[0])
+
+
+class CameraRouter:
+    """
+    Routes Kafka messages to configured cameras with a single dictionary lookup.
+
+    Messages of unknown cameras or without headers are counted in metrics
+    instead of being compared against every camera.
+    """
+
+    def __init__(
+        self,
+        cameras: List[Camera],
+        header_keys: KafkaHeadersConfig = KafkaHeadersConfig(),
+        name: str = "kafka",
+    ):
+        self.name = name
+        self.header_keys = header_keys
+        self._cameras: Dict[bytes, Camera] = {
+            camera.name.encode(): camera for camera in cameras
+        }
+
+    def route(self, message) -> Optional[Camera]:
+        try:
+            camera_name = message_camera_name(message, self.header_keys)
+        except (IndexError, TypeError):
+            logging.error(f"[{self.name}] There is no selected headers!")
+            metrics.inc(f"{self.name}_missing_headers")
+            return None
+
+        camera = self._cameras.get(camera_name)
+        if camera is None:
+            metrics.inc(
+                f"{self.name}_unknown_camera", camera_name.decode(errors="replace")
+            )
+        return camera
+
+    def timestamp(self, message) -> int:
+        return message_timestamp(message, self.header_keys)
+
+    def __len__(self):
+        return len(self._cameras)
@@ -3,11 +3,12 @@ import os
 import sys
 import pathlib
 import logging
+import threading
 import json
 import os
 from dotenv import load_dotenv
-from typing import List, Dict, Optional, Tuple
-from pydantic import BaseModel, Field, ValidationError
+from typing import List, Dict, Literal, Optional, Tuple
+from pydantic import BaseModel, Field, ValidationError, model_validator
 
 CONFIG_FILE = pathlib.Path(os.path.dirname(__file__), "config.json")
 
@@ -25,11 +26,30 @@ def configure_logging():
 
 
 # Configuration file
+class SlackDispatcherConfig(BaseModel):
+    enabled: bool = Field(
+        True, description="Send notifications from a background thread."
+    )
+    queue_size: int = Field(
+        100, description="Maximum queued notifications, newer ones are dropped."
+    )
+    coalesce_window_s: float = Field(
+        5.0,
+        description="Notifications of the same camera/region within this window are sent as one message.",
+    )
+    max_images: int = Field(10, description="Maximum images of a merged message.")
+    min_interval_s: float = Field(
+        1.0, description="Minimum time between two messages sent to Slack."
+    )
+    retries: int = Field(3, description="Retries of rate limited messages.")
+
+
 class SlackConfig(BaseModel):
     oauth_token: str
     app_token: str
     notify_url: str
     channel: str
+    dispatcher: SlackDispatcherConfig = Field(default_factory=SlackDispatcherConfig)
 
 
 class DeepfaceConfig(BaseModel):
@@ -37,10 +57,61 @@ class DeepfaceConfig(BaseModel):
     embedding_dim: int
     deepface_model_name: str
     url: str
+    scan_mode: Literal["separate", "combined", "lazy"] = Field(
+        "combined",
+        description="'separate' sends the person crop to represent and analyze, both detect faces. 'combined' detects faces once in represent and sends only the found face crops to analyze, still one represent request plus one analyze request per face, the analyze requests of a crop run concurrently. 'lazy' stores only embeddings, faces are analyzed when find_faces first returns them, the result is kept in MinIO under the face index, or when they trigger an ROI alert.",
+    )
+    actions: List[str] = Field(
+        ["age", "gender", "emotion", "race"],
+        description="Face characteristics computed by deepface analyze.",
+    )
+    max_concurrency: int = Field(
+        4, description="Maximum number of faces analyzed at once in 'combined' mode."
+    )
 
 
 class FlorenceConfig(BaseModel):
     url: str
+    max_concurrency: int = Field(
+        4, description="Maximum number of prompts sent to Florence at once."
+    )
+    batching: bool = Field(
+        False,
+        description="Group person captions and plate OCR crops from all cameras into bursts of requests. Adds up to batch_max_wait_ms of latency and saves no round trips, useful only with a server batching concurrent requests.",
+    )
+    batch_max_items: int = Field(8, description="Maximum number of crops in a batch.")
+    batch_max_wait_ms: int = Field(
+        20, description="Maximum time a crop waits for the batch to fill."
+    )
+
+
+class HttpBackendConfig(BaseModel):
+    pool_size: int = Field(16, description="Keep-alive connections kept per host.")
+    connect_timeout_s: float = Field(
+        3.05, description="Timeout of opening a connection."
+    )
+    read_timeout_s: float = Field(
+        120.0, description="Timeout of waiting for a response."
+    )
+    retries: int = Field(
+        2, description="Retries of connection errors and retry_statuses responses."
+    )
+    retry_statuses: List[int] = Field(
+        [429, 500, 502, 503, 504],
+        description="Response status codes retried with backoff. 429 is left to the Slack dispatcher for the slack backend when it is enabled.",
+    )
+    backoff_s: float = Field(
+        0.25, description="Base of exponential backoff with jitter between retries."
+    )
+    max_concurrency: int = Field(8, description="Maximum concurrent requests per host.")
+
+
+class HttpConfig(BaseModel):
+    default: HttpBackendConfig = Field(default_factory=HttpBackendConfig)
+    backends: Dict[str, HttpBackendConfig] = Field(
+        {},
+        description="Overrides per backend: florence, deepface, whispar, xtts, slack, ollama.",
+    )
 
 
 class InfluxDBConfig(BaseModel):
@@ -55,14 +126,159 @@ class KafkaTopics(BaseModel):
     audio: str
 
 
+class KafkaHeadersConfig(BaseModel):
+    camera: str = Field(
+        "camera", description="Header key holding the camera name of the message."
+    )
+    timestamp: str = Field(
+        "timestamp", description="Header key holding the unix timestamp of the message."
+    )
+
+
+class WorkerPoolConfig(BaseModel):
+    max_workers: int = Field(
+        4, description="Number of threads analyzing messages concurrently."
+    )
+    queue_size: int = Field(
+        8,
+        description="Maximum number of messages waiting per camera before polling is paused.",
+    )
+
+
+class ConsumptionPolicyConfig(BaseModel):
+    mode: Literal["all", "latest", "lag"] = Field(
+        "lag",
+        description="'all' processes every record, 'latest' only the newest record per camera of every poll, 'lag' skips to the end of partition when lag passes lag_threshold.",
+    )
+    lag_threshold: int = Field(
+        64, description="Records left in partition after which 'lag' mode skips ahead."
+    )
+
+
+class KafkaConsumptionConfig(BaseModel):
+    image: ConsumptionPolicyConfig = Field(default_factory=ConsumptionPolicyConfig)
+    audio: ConsumptionPolicyConfig = Field(default_factory=ConsumptionPolicyConfig)
+
+
+class OffsetCommitConfig(BaseModel):
+    interval_s: float = Field(
+        5.0, description="Maximum time between commits of processed offsets."
+    )
+    max_messages: int = Field(
+        100, description="Commit earlier once this many messages were processed."
+    )
+
+
 class KafkaConfig(BaseModel):
     api_url: str
     topics: KafkaTopics
+    headers: KafkaHeadersConfig = Field(
+        default_factory=KafkaHeadersConfig,
+        description="Header keys of messages, positional headers are used when the keys are missing.",
+    )
+    consumption: KafkaConsumptionConfig = Field(
+        default_factory=KafkaConsumptionConfig,
+        description="Which polled records of image and audio topics are analyzed.",
+    )
+    commits: OffsetCommitConfig = Field(
+        default_factory=OffsetCommitConfig,
+        description="Cadence of offset commits, only analyzed messages are committed.",
+    )
+    image_workers: WorkerPoolConfig = Field(
+        default_factory=WorkerPoolConfig,
+        description="Worker pool analyzing images, cameras are processed in parallel.",
+    )
+
+
+class ReplayConfig(BaseModel):
+    path: str = Field(
+        ...,
+        description="Directory or zip archive with manifest.jsonl and recorded images and audio.",
+    )
+    speed: float = Field(
+        1.0,
+        description="Replay speed multiplier, 1 replays at original speed, 0 as fast as possible.",
+    )
+    loop: bool = Field(False, description="Start over after the last message.")
+
+
+class IngestionConfig(BaseModel):
+    source: Literal["kafka", "replay"] = Field(
+        "kafka", description="Where images and audio are read from."
+    )
+    replay: Optional[ReplayConfig] = Field(
+        None, description="Recording to replay, required for 'replay' source."
+    )
+
+    @model_validator(mode="after")
+    def check_replay(self):
+        if self.source == "replay" and self.replay is None:
+            raise ValueError("'replay' source requires the 'replay' section")
+        return self
+
+
+class MilvusWriterConfig(BaseModel):
+    max_rows: int = Field(
+        256, description="Flush a collection buffer at this many rows."
+    )
+    max_bytes: int = Field(
+        4 * 1024 * 1024,
+        description="Flush a collection buffer at this approximate size.",
+    )
+    max_age_s: float = Field(
+        2.0,
+        description="Flush a collection buffer when its oldest row waited this long.",
+    )
+    retries: int = Field(3, description="Retries of a failed insert.")
+    retry_backoff_s: float = Field(
+        0.5, description="Delay before the first retry, doubled for every next one."
+    )
+    max_buffered_rows: int = Field(
+        4096,
+        description="Rows of a collection kept for the next flush when an insert failed after all retries, further rows are dropped.",
+    )
+
+
+class MilvusBootstrapConfig(BaseModel):
+    timeout_s: float = Field(
+        60.0, description="Maximum wait for a collection to be loaded."
+    )
+    poll_interval_s: float = Field(
+        0.2, description="Interval of load state checks during startup."
+    )
+    cache_file: Optional[str] = Field(
+        "cache/milvus_schema.json",
+        description="Fingerprint of bootstrapped schemas, startup with matching schemas only checks that collections exist and are loaded. None disables caching.",
+    )
 
 
 class MilvusConfig(BaseModel):
     token: str
     uri: str
+    bootstrap: MilvusBootstrapConfig = Field(
+        default_factory=MilvusBootstrapConfig,
+        description="Creation of collections on startup.",
+    )
+    writer: MilvusWriterConfig = Field(
+        default_factory=MilvusWriterConfig,
+        description="Buffered bulk inserts of analytics results.",
+    )
+
+
+class MinioUploaderConfig(BaseModel):
+    enabled: bool = Field(True, description="Upload objects from background threads.")
+    workers: int = Field(4, description="Number of upload threads.")
+    queue_size: int = Field(
+        256, description="Maximum queued uploads, newer ones are dropped."
+    )
+    recent_keys: int = Field(
+        100000,
+        description="Number of recently written object keys remembered to skip duplicate uploads.",
+    )
+    part_size: int = Field(
+        5 * 1024 * 1024,
+        description="Objects larger than this are sent as multipart uploads in parts of this size, at least 5 MiB.",
+    )
 
 
 class MinIOConfig(BaseModel):
@@ -72,6 +288,29 @@ class MinIOConfig(BaseModel):
     host: str
     location: str
     secret_key: str
+    uploader: MinioUploaderConfig = Field(default_factory=MinioUploaderConfig)
+
+
+class EmbeddingServiceConfig(BaseModel):
+    cache_size: int = Field(
+        10000, description="Maximum number of cached text embeddings."
+    )
+    persist_path: Optional[str] = Field(
+        None,
+        description="Base path of memory-mapped files keeping cached embeddings across restarts, None keeps them in memory only.",
+    )
+    batch_max_items: int = Field(
+        32, description="Maximum number of texts collected in one batch."
+    )
+    batch_max_wait_ms: int = Field(
+        10, description="Maximum time a text waits for others to fill its batch."
+    )
+    max_concurrency: int = Field(
+        4, description="Maximum number of texts of a batch embedded at once."
+    )
+    flush_interval_s: float = Field(
+        5.0, description="Minimum time between writes of the cache to disk."
+    )
 
 
 class OllamaConfig(BaseModel):
@@ -81,11 +320,26 @@ class OllamaConfig(BaseModel):
     summarize_model: str
     host: str
     response_language: str
+    embeddings: EmbeddingServiceConfig = Field(
+        default_factory=EmbeddingServiceConfig,
+        description="Batching and caching of text embeddings.",
+    )
 
 
 class WhisparConfig(BaseModel):
     api_key: str
     api_url: str
+    max_concurrency: int = Field(
+        8,
+        description="Maximum number of audio chunks transcribed at once, also sets the concurrency limit of the whispar HTTP transport. A segment of n chunks takes about n / max_concurrency round trips.",
+    )
+    chunk_format: Literal["wav", "mp3", "opus"] = Field(
+        "wav",
+        description="Format of speech chunks sent to Whisper and XTTS and stored in MinIO. 'wav' wraps the decoded samples without spawning ffmpeg.",
+    )
+    encoder_processes: int = Field(
+        2, description="Worker processes encoding 'mp3' and 'opus' chunks."
+    )
 
 
 class XTTSConfig(BaseModel):
@@ -100,6 +354,46 @@ class Place(BaseModel):
     )
 
 
+class MotionConfig(BaseModel):
+    enabled: bool = Field(
+        False, description="Skip frames without scene changes before object detection."
+    )
+    threshold: float = Field(
+        0.01, description="Fraction of changed pixels required to pass a frame."
+    )
+    pixel_threshold: int = Field(
+        25,
+        description="Grayscale difference (0-255) after which a pixel counts as changed.",
+    )
+    width: int = Field(
+        160, description="Width of downscaled frame used for comparison."
+    )
+    background_alpha: float = Field(
+        0.05, description="Weight of the newest frame in the rolling background."
+    )
+    mask_places: bool = Field(
+        False, description="Compare only pixels inside places polygons of the camera."
+    )
+    max_skip_s: float = Field(
+        30.0, description="Pass a frame at least this often even without changes."
+    )
+
+
+class PlacesRasterConfig(BaseModel):
+    enabled: bool = Field(
+        False,
+        description="Look up places of persons in a rasterized place label bitmap instead of polygons.",
+    )
+    downscale: int = Field(
+        4,
+        description="Frame pixels per bitmap cell, places match within this tolerance.",
+    )
+    cache_dir: Optional[str] = Field(
+        "cache/places",
+        description="Directory of rasterized bitmaps reused across restarts, None disables caching.",
+    )
+
+
 class Camera(BaseModel):
     name: str = Field(..., description="The name of the camera.")
     places: List[Place] = Field(
@@ -108,6 +402,45 @@ class Camera(BaseModel):
     persons_roi: Optional[List[str]] = Field(
         default=None, description="The ROI for persons to alert with slack."
     )
+    motion: MotionConfig = Field(
+        default_factory=MotionConfig,
+        description="Change detection skipping unchanged frames of this camera.",
+    )
+    places_raster: PlacesRasterConfig = Field(
+        default_factory=PlacesRasterConfig,
+        description="Rasterized place lookup of this camera.",
+    )
+
+
+class PersonsTrackingConfig(BaseModel):
+    enabled: bool = Field(
+        True,
+        description="Track persons per camera and enrich them only on track birth and re-check.",
+    )
+    iou_threshold: float = Field(
+        0.3, description="Minimum IoU of detection and track bboxes to match them."
+    )
+    max_centroid_distance: float = Field(
+        0.5,
+        description="Maximum centroid distance, relative to track bbox diagonal, of non overlapping matches.",
+    )
+    max_age_s: float = Field(
+        10.0, description="Track is dropped when its person was not seen for this long."
+    )
+    recheck_interval_s: float = Field(
+        60.0, description="Enrich tracked person again after this many seconds."
+    )
+
+
+class PersonsConfig(BaseModel):
+    workers: int = Field(
+        16,
+        description="Threads enriching persons (caption, faces, storage) of all cameras.",
+    )
+    max_concurrency_per_frame: int = Field(
+        4, description="Maximum number of persons of one frame enriched at once."
+    )
+    tracking: PersonsTrackingConfig = Field(default_factory=PersonsTrackingConfig)
 
 
 class Config(BaseModel):
@@ -116,11 +449,23 @@ class Config(BaseModel):
     )
     deepface: DeepfaceConfig
     florence: FlorenceConfig
+    http: HttpConfig = Field(
+        default_factory=HttpConfig,
+        description="Connection pools, timeouts and retries of model backends.",
+    )
     influxdb: InfluxDBConfig
+    ingestion: IngestionConfig = Field(
+        default_factory=IngestionConfig,
+        description="Source of images and audio, Kafka or a local recording.",
+    )
     kafka: KafkaConfig
     milvus: MilvusConfig
     minio: MinIOConfig
     ollama: OllamaConfig
+    persons: PersonsConfig = Field(
+        default_factory=PersonsConfig,
+        description="Processing of persons detected in frames.",
+    )
     slack: SlackConfig
     whispar: WhisparConfig
     xtts: XTTSConfig
@@ -128,9 +473,28 @@ class Config(BaseModel):
         ...,
         description="The language to use in user facing interfaces like Slack. Formated in short form as en, pl, de",
     )
+    location: str = Field(
+        "", description="Location of the cameras saved with analytics results."
+    )
+
+
+_config: Optional[Config] = None
+_config_lock = threading.Lock()
 
 
 def genconf() -> Optional[Config]:
+    """
+    Process-wide configuration, `config.json` is parsed on the first call and
+    the same instance is returned afterwards.
+    """
+    global _config
+    with _config_lock:
+        if _config is None:
+            _config = load_config()
+        return _config
+
+
+def load_config() -> Optional[Config]:
     try:
         configuration = Config.parse_file(CONFIG_FILE)
         return configuration
@@ -0,0 +1,88 @@
+import logging
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from utils.camera_routing import CameraRouter
+from utils.config import Camera, ConsumptionPolicyConfig
+from utils.metrics import metrics
+
+
+class ConsumptionPolicy:
+    """
+    Decides which polled Kafka messages are analyzed.
+
+    Modes:
+     - `all` processes every record.
+     - `latest` keeps only the newest message per camera of every polled partition.
+     - `lag` processes every record until the partition lag passes
+       `lag_threshold`, then keeps the newest message per camera and skips the
+       partition to its end.
+
+    Messages dropped from a poll are counted per camera in
+    `<name>_frames_dropped`, records skipped by seeking are counted per
+    partition in `<name>_frames_skipped` as they are never fetched.
+    """
+
+    def __init__(
+        self,
+        policy: ConsumptionPolicyConfig,
+        router: CameraRouter,
+        name: str = "kafka",
+    ):
+        self.policy = policy
+        self.router = router
+        self.name = name
+
+    def select(self, consumer, records: dict) -> List[Tuple[object, Camera]]:
+        """
+        :param consumer: KafkaConsumer the records were polled with.
+        :param records: Result of `consumer.poll`.
+        :return: List of (message, camera) to analyze, in partition order.
+        """
+        selected = []
+        for tp, records_batch in records.items():
+            routed = []
+            for message in records_batch:
+                camera = self.router.route(message)
+                if camera is not None:
+                    routed.append((message, camera))
+
+            if self.policy.mode == "latest":
+                routed = self._keep_latest(routed)
+            elif self.policy.mode == "lag" and records_batch:
+                lag = self._partition_lag(consumer, tp, records_batch[-1].offset)
+                if lag > self.policy.lag_threshold:
+                    logging.debug(
+                        f"[{self.name}] Partition {tp.topic}-{tp.partition} lags {lag} records, skipping to end"
+                    )
+                    routed = self._keep_latest(routed)
+                    consumer.seek_to_end(tp)
+                    metrics.inc(
+                        f"{self.name}_frames_skipped", f"{tp.topic}-{tp.partition}", lag
+                    )
+            selected.extend(routed)
+        return selected
+
+    def _keep_latest(self, routed):
+        latest: Dict[str, Tuple[object, Camera]] = {}
+        dropped: Dict[str, int] = defaultdict(int)
+        for message, camera in routed:
+            if camera.name in latest:
+                dropped[camera.name] += 1
+            latest[camera.name] = (message, camera)
+        for camera_name, count in dropped.items():
+            metrics.inc(f"{self.name}_frames_dropped", camera_name, count)
+        return sorted(latest.values(), key=lambda routed: routed[0].offset)
+
+    @staticmethod
+    def _partition_lag(consumer, tp, last_offset: int) -> int:
+        """
+        Records left in the partition after `last_offset`.
+
+        Uses the highwater mark cached from the fetch response and asks the
+        broker only when it is not known yet.
+        """
+        highwater = consumer.highwater(tp)
+        if highwater is None:
+            highwater = consumer.end_offsets([tp])[tp]
+        return max(0, highwater - (last_offset + 1))
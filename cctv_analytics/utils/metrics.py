@@ -0,0 +1,48 @@
+import threading
+from collections import defaultdict
+from typing import Callable, Dict
+
+
+class Metrics:
+    """
+    Thread-safe in-process counters and gauges.
+
+    Counters and gauges are keyed by metric name and a label (usually the camera
+    name). Gauges can also be registered as callbacks which are evaluated when
+    a snapshot is taken. The snapshot is served by the HTTP API under `/metrics`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: defaultdict(int)
+        )
+        self._gauges: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._gauge_callbacks: Dict[str, Callable[[], Dict[str, float]]] = {}
+
+    def inc(self, name: str, key: str = "total", value: int = 1):
+        with self._lock:
+            self._counters[name][key] += value
+
+    def set(self, name: str, key: str, value: float):
+        with self._lock:
+            self._gauges[name][key] = value
+
+    def register_gauge(self, name: str, callback: Callable[[], Dict[str, float]]):
+        """
+        Register a callback returning `{label: value}` evaluated on every snapshot.
+        """
+        with self._lock:
+            self._gauge_callbacks[name] = callback
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = {name: dict(values) for name, values in self._counters.items()}
+            gauges = {name: dict(values) for name, values in self._gauges.items()}
+            callbacks = dict(self._gauge_callbacks)
+        for name, callback in callbacks.items():
+            gauges[name] = dict(callback())
+        return {"counters": counters, "gauges": gauges}
+
+
+metrics = Metrics()
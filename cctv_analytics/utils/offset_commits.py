@@ -0,0 +1,130 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Set
+
+from utils.metrics import metrics
+
+
+class OffsetCommitManager:
+    """
+    Commits Kafka offsets only for messages whose analytics finished.
+
+    Messages are tracked when they are handed over for processing and marked
+    done by whichever thread processed them. The committed offset of a
+    partition is the lowest offset still in flight, or the offset after the
+    last polled record when nothing is in flight, so a message is never marked
+    consumed before it was analyzed (at-least-once). Records which were polled
+    but not selected for processing are treated as done.
+
+    Commits are batched on a time and message count cadence and must be
+    issued from the thread owning the consumer by calling `maybe_commit`.
+    """
+
+    def __init__(
+        self,
+        consumer,
+        interval_s: float = 5.0,
+        max_messages: int = 100,
+        name: str = "kafka",
+    ):
+        self.consumer = consumer
+        self.interval_s = interval_s
+        self.max_messages = max_messages
+        self.name = name
+        self._lock = threading.Lock()
+        self._in_flight: Dict[object, Set[int]] = defaultdict(set)
+        self._polled_until: Dict[object, int] = {}
+        self._committed: Dict[object, int] = {}
+        self._done_since_commit = 0
+        self._last_commit = time.monotonic()
+
+    def polled(self, records: dict):
+        """
+        Register the result of `consumer.poll`.
+        """
+        with self._lock:
+            for tp, records_batch in records.items():
+                if records_batch:
+                    next_offset = records_batch[-1].offset + 1
+                    self._polled_until[tp] = max(
+                        self._polled_until.get(tp, 0), next_offset
+                    )
+
+    def track(self, message):
+        """
+        Mark message as handed over for processing.
+        """
+        with self._lock:
+            tp = self._message_tp(message)
+            self._in_flight[tp].add(message.offset)
+            self._polled_until[tp] = max(
+                self._polled_until.get(tp, 0), message.offset + 1
+            )
+
+    def done(self, message):
+        """
+        Mark message as processed, safe to call from any thread.
+        """
+        with self._lock:
+            self._in_flight[self._message_tp(message)].discard(message.offset)
+            self._done_since_commit += 1
+
+    def maybe_commit(self, force: bool = False):
+        """
+        Commit finished offsets when the interval passed or enough messages
+        were processed since the last commit.
+        """
+        now = time.monotonic()
+        with self._lock:
+            due = (
+                self._done_since_commit >= self.max_messages
+                or now - self._last_commit >= self.interval_s
+            )
+            if not (force or due):
+                return
+            assigned = self.consumer.assignment()
+            offsets = {}
+            for tp, polled_until in self._polled_until.items():
+                if tp not in assigned:
+                    continue
+                in_flight = self._in_flight.get(tp)
+                commit_offset = min(in_flight) if in_flight else polled_until
+                if commit_offset > self._committed.get(tp, -1):
+                    offsets[tp] = commit_offset
+            self._forget_revoked(assigned)
+            self._done_since_commit = 0
+            self._last_commit = now
+
+        if not offsets:
+            return
+        from kafka.structs import OffsetAndMetadata
+
+        try:
+            self.consumer.commit(
+                offsets={
+                    tp: OffsetAndMetadata(offset, None)
+                    for tp, offset in offsets.items()
+                }
+            )
+        except Exception as e:
+            logging.warning(f"[{self.name}] Could not commit offsets: {e}")
+            metrics.inc(f"{self.name}_commit_failures")
+            return
+        with self._lock:
+            self._committed.update(offsets)
+        metrics.inc(f"{self.name}_commits")
+
+    def _forget_revoked(self, assigned):
+        for tp in list(self._polled_until):
+            if tp not in assigned:
+                self._polled_until.pop(tp, None)
+                self._in_flight.pop(tp, None)
+                self._committed.pop(tp, None)
+
+    @staticmethod
+    def _message_tp(message):
+        from kafka.structs import TopicPartition
+
+        return TopicPartition(message.topic, message.partition)
@@ -0,0 +1,118 @@
+import logging
+import queue
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Set
+
+from utils.metrics import metrics
+
+
+class CameraWorkerPool:
+    """
+    Runs a handler over Kafka messages on a bounded pool of threads.
+
+    Messages of one camera are processed strictly in submission order while
+    messages of different cameras are processed in parallel. Every camera has
+    its own bounded queue, `submit` blocks when it is full which applies
+    backpressure to the poll loop feeding the pool.
+    """
+
+    def __init__(
+        self,
+        handler: Callable,
+        max_workers: int = 4,
+        queue_size: int = 8,
+        name: str = "cctv-worker",
+    ):
+        """
+        :param handler: Function called as `handler(message, camera)`.
+        :param max_workers: Number of threads processing messages.
+        :param queue_size: Maximum number of pending messages per camera.
+        :param name: Thread name prefix, also used as metric name prefix.
+        """
+        self.name = name
+        self._handler = handler
+        self._queue_size = queue_size
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=name
+        )
+        self._queues: Dict[str, queue.Queue] = {}
+        self._active: Set[str] = set()
+        self._lock = threading.Lock()
+        metrics.register_gauge(f"{name}_queue_depth", self.queue_depths)
+
+    def _queue_for(self, camera_name: str) -> queue.Queue:
+        with self._lock:
+            if camera_name not in self._queues:
+                self._queues[camera_name] = queue.Queue(maxsize=self._queue_size)
+            return self._queues[camera_name]
+
+    def submit(self, message, camera, timeout=None, on_done=None):
+        """
+        Queue message for processing, blocks while the camera queue is full.
+
+        :param on_done: Called as `on_done(message)` after the handler returned
+            or failed.
+        :raises queue.Full: When `timeout` is given and the queue stayed full.
+        """
+        self._queue_for(camera.name).put((message, camera, on_done), timeout=timeout)
+        self._schedule(camera.name)
+
+    def _schedule(self, camera_name: str):
+        with self._lock:
+            if camera_name in self._active:
+                return
+            self._active.add(camera_name)
+        self._executor.submit(self._run_next, camera_name)
+
+    def _run_next(self, camera_name: str):
+        """
+        Process a single message of the camera and reschedule it at the end of
+        the executor queue, so busy cameras can not starve the others.
+        """
+        camera_queue = self._queues[camera_name]
+        try:
+            message, camera, on_done = camera_queue.get_nowait()
+        except queue.Empty:
+            message = None
+
+        if message is not None:
+            try:
+                self._handler(message, camera)
+            except Exception:
+                logging.error(
+                    f"[{camera_name}][{self.name}] Handler failed "
+                    + traceback.format_exc()
+                )
+            finally:
+                if on_done is not None:
+                    on_done(message)
+                camera_queue.task_done()
+
+        with self._lock:
+            if camera_queue.empty():
+                self._active.discard(camera_name)
+                return
+        self._executor.submit(self._run_next, camera_name)
+
+    def queue_depths(self) -> Dict[str, int]:
+        """
+        Number of messages waiting per camera.
+        """
+        with self._lock:
+            return {name: q.qsize() for name, q in self._queues.items()}
+
+    def join(self):
+        """
+        Block until every queued message has been processed.
+        """
+        with self._lock:
+            queues = list(self._queues.values())
+        for camera_queue in queues:
+            camera_queue.join()
+
+    def shutdown(self, wait=True):
+        if wait:
+            self.join()
+        self._executor.shutdown(wait=wait)